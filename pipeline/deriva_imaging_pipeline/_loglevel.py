@@ -0,0 +1,49 @@
+# 
+# Copyright 2020 University of Southern California
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#    http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Logging setup from the "loglevel" and "log" entries of the configuration file.
+"""
+
+import logging
+from types import MappingProxyType
+
+# Log record format, shared by the client and the server
+FORMAT = '%(asctime)s: %(levelname)s <%(module)s>: %(message)s'
+
+# Loglevel dictionary
+LEVELS = MappingProxyType({
+    'critical': logging.FATAL,
+    'fatal': logging.CRITICAL,
+    'error': logging.ERROR,
+    'warning': logging.WARNING,
+    'info': logging.INFO,
+    'debug': logging.DEBUG
+})
+
+def init_config_logging(cfg):
+    """
+    Log to the "log" file of the configuration, at its "loglevel".
+    
+    The level defaults to warning when missing or unknown. Without a log
+    file the records are discarded.
+    """
+    
+    logfile = cfg.get('log', None)
+    if logfile:
+        from deriva.core import init_logging
+        init_logging(level=LEVELS.get(cfg.get('loglevel') or '', logging.WARNING), log_format=FORMAT, file_path=logfile)
+    else:
+        logging.getLogger().addHandler(logging.NullHandler())
@@ -22,27 +22,51 @@ Update the ermrest tables.
 """
 
 import os
+import stat
 import logging
-import json
 import sys
-import traceback
-import argparse
+import string
 
-from .worker import DerivaImagingWorker
-from deriva.core import init_logging
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from ._loglevel import init_config_logging
 
-FORMAT = '%(asctime)s: %(levelname)s <%(module)s>: %(message)s'
 logger = logging.getLogger(__name__)
 
-# Loglevel dictionary
-__LOGLEVEL = {
-    'critical': logging.FATAL,
-    'fatal': logging.CRITICAL,
-    'error': logging.ERROR,
-    'warning': logging.WARNING,
-    'info': logging.INFO,
-    'debug': logging.DEBUG
-}
+# The model entries used by the worker
+MODEL_KEYS = ('primary_schema', 'primary_table', 'primary_file_name', 'primary_file_url', 'primary_file_thumbnail',
+              'processing_status', 'image_schema', 'image_table', 'processed_image', 'image_channel', 'image_z')
+
+# Parsed JSON files, keyed by (path, keys), with the (st_mtime_ns, st_size) they were parsed from
+_JSON_CACHE = {}
+
+def compile_template(template):
+    """
+    Pre-parse a str.format() template into a function of a row.
+    
+    Templates made only of literal text and named fields are rendered from the
+    parsed pieces; anything fancier (indexing, conversions, format specs)
+    falls back to str.format(). A malformed template raises ValueError here,
+    rather than when the first image is processed.
+    """
+    parsed = list(string.Formatter().parse(template))
+    for literal, field, spec, conversion in parsed:
+        if field != None and (spec or conversion or not field.isidentifier()):
+            return lambda row: template.format(**row)
+    pieces = tuple((literal, field) for literal, field, spec, conversion in parsed)
+    
+    def render(row):
+        return ''.join([literal if field == None else literal + format(row[field]) for literal, field in pieces])
+    
+    return render
 
 def load(config_filename):
     """
@@ -53,17 +77,11 @@ def load(config_filename):
     cfg = {}
     if os.path.exists(config_filename):
         try:
-            with open(config_filename, 'r') as f:
-                cfg = json.load(f)
-            loglevel = cfg.get('loglevel', None)
-            logfile = cfg.get('log', None)
-            if loglevel and logfile:
-                init_logging(level=__LOGLEVEL.get(loglevel), log_format=FORMAT, file_path=logfile)
-            else:
-                logging.getLogger().addHandler(logging.NullHandler())
+            cfg = load_json_cached(config_filename)
+            init_config_logging(cfg)
             logger.debug("config: %s" % cfg)
             return cfg
-        except ValueError as e:
+        except (OSError, ValueError) as e:
             logger.error('Malformed configuration file: %s' % e)
             return None
     else:
@@ -71,168 +89,330 @@ def load(config_filename):
         return None
     
     
-def get_configuration(cfg, logger):
+def load_json_cached(path, keys=None):
     """
-    Return the client configuration.
+    Return the parsed content of a JSON file.
+    
+    The file is parsed only if it was modified since the last call, 
+    otherwise the cached value is returned. If keys is given, only those 
+    top level entries are kept and, when ijson is available, the file is 
+    streamed instead of being read in memory. Anything but a regular file, 
+    or a file with NUL bytes at its start, is rejected before parsing, and
+    the top level of the file must be a JSON object. 
+    Raises OSError or ValueError.
     """
     
-    config = {}
-    baseuri = cfg.get('baseuri', None)
-    if baseuri == None:
-        logger.error('The "baseuri" must be supplied in the configuration file.')
-        return None
-        
-    config['baseuri'] = baseuri
+    st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise ValueError('"%s" is not a regular file' % path)
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _JSON_CACHE.get((path, keys))
+    if cached != None and cached[0] == signature:
+        return cached[1]
     
-    deriva_imaging_server = cfg.get('deriva_imaging_server', None)
-    if deriva_imaging_server == None:
-        logger.error('The "deriva_imaging_server" must be supplied in the configuration file.')
-        return None
-
-    credfile = cfg.get('credentials_file', None)
-    if not credfile or not os.path.isfile(credfile):
-        logger.error('The "credendential_file" must be provided in the configuration file and exists.')
-        return None
-
-    cookie = json.load(open(credfile))
-    if 'cookie' not in cookie.keys():
-        cookie = cookie[deriva_imaging_server]['cookie']
-
-    if not cookie:
-        logger.error('The ermrest cookie could not be identified.')
-        return None
-
-    config['cookie'] = cookie
-
-    hatrac_template = cfg.get('hatrac_template', None)
-    if hatrac_template == None:
-        logger.error('The "hatrac_template" must be provided in the configuration file.')
-        return None
-
-    config['hatrac_template'] = hatrac_template
-
-    iiif_url = cfg.get('iiif_url', None)
-    if iiif_url == None:
-        logger.error('The "iiif_url" must be provided in the configuration file.')
-        return None
-
-    config['iiif_url'] = iiif_url
-
-    data_scratch = cfg.get('data_scratch', None)
-    if not data_scratch or not os.path.isdir(data_scratch):
-        logger.error('The "data_scratch" directory must be provided in the configuration file and exists.')
-        return None
-
-    config['data_scratch'] = data_scratch
-
-    curl = cfg.get('curl', None)
-    if not curl or not os.path.isfile(curl):
-        logger.error('The "curl" application must be provided in the configuration file and exists.')
-        return None
-
-    config['curl'] = curl
-
-    wget = cfg.get('wget', None)
-    if not wget or not os.path.isfile(wget):
-        logger.error('The "wget" application must be provided in the configuration file and exists.')
-        return None
-
-    config['wget'] = wget
-
-    images = cfg.get('images', None)
-    if not images or not os.path.isdir('/var/www/html/%s' % images):
-        logger.error('The "images" directory must be provided in the configuration file and exists.')
-        return None
-
-    config['images'] = images
-
-    output_metadata = cfg.get('output_metadata', None)
-    if not output_metadata or not os.path.isdir('/var/www/html/%s' % output_metadata):
-        logger.error('The "output_metadata" directory must be provided in the configuration file and exists.')
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        if b'\x00' in head:
+            raise ValueError('"%s" is a binary file, not JSON' % path)
+        f.seek(0)
+        if keys != None and ijson != None:
+            # kvitems() silently yields nothing for anything but an object
+            if not head.lstrip().startswith(b'{'):
+                raise ValueError('"%s" must contain a JSON object' % path)
+            try:
+                value = {key: item for key, item in ijson.kvitems(f, '', use_float=True) if key in keys}
+            except ijson.JSONError as e:
+                raise ValueError(str(e))
+        else:
+            value = json_loads(f.read())
+            if not isinstance(value, dict):
+                raise ValueError('"%s" must contain a JSON object' % path)
+            if keys != None:
+                value = {key: value[key] for key in keys if key in value}
+    _JSON_CACHE[(path, keys)] = (signature, value)
+    return value
+    
+def load_credentials(credfile, server):
+    """
+    Return the credentials of the server from the credentials file.
+    
+    The file holds either the credentials themselves, or the credentials
+    of each server, by server name. It is parsed again only when modified.
+    Raises OSError, ValueError or KeyError.
+    """
+    
+    credentials = load_json_cached(credfile)
+    if 'cookie' not in credentials:
+        credentials = credentials[server]
+    return credentials
+    
+def _stat_kind(path):
+    """
+    Return the kind ('file', 'dir' or None) of a path from a single os.stat().
+    """
+    
+    try:
+        mode = os.stat(path).st_mode
+    except (OSError, ValueError):
         return None
-
-    config['output_metadata'] = output_metadata
-
-    processing_dir = cfg.get('processing_dir', None)
-    config['processing_dir'] = processing_dir
-
-    model_file = cfg.get('model_file', None)
-    if not model_file or not os.path.isfile(model_file):
-        logger.error('The "model_file" must be provided in the configuration file and exist.')
+    if stat.S_ISDIR(mode):
+        return 'dir'
+    elif stat.S_ISREG(mode):
+        return 'file'
+    else:
         return None
 
-    with open(model_file, 'r') as fr:
-        model = json.load(fr)
+def get_path_kinds(paths):
+    """
+    Return a dictionary with the kind ('file', 'dir' or None) of each path.
+    
+    Paths sharing the same parent directory are resolved with a single 
+    os.scandir() pass, using the cached DirEntry metadata. A path that 
+    does not share its parent with other paths, or that the scan could not
+    resolve (unreadable parent, no matching entry), is checked with os.stat().
+    """
+    
+    parents = {}
+    for path in paths:
+        # normalized, so that a trailing slash does not yield an empty name
+        parent, name = os.path.split(os.path.normpath(path))
+        parents.setdefault(parent or os.curdir, []).append((name, path))
     
-    config['model'] = model
+    kinds = {}
+    for parent, entries in parents.items():
+        if len(entries) > 1:
+            try:
+                with os.scandir(parent) as it:
+                    present = {entry.name: entry for entry in it}
+            except OSError:
+                present = {}
+            for name, path in entries:
+                entry = present.get(name)
+                if entry == None:
+                    kinds[path] = _stat_kind(path)
+                elif entry.is_dir():
+                    kinds[path] = 'dir'
+                elif entry.is_file():
+                    kinds[path] = 'file'
+                else:
+                    kinds[path] = None
+        else:
+            name, path = entries[0]
+            kinds[path] = _stat_kind(path)
+    
+    return kinds
+
+# The plain configuration entries, in the order they are checked: 
+# (name in the configuration file, name in the worker configuration, kind, error message).
+# Each entry must be present and non empty; a "dir" or a "file" must also exist, 
+# and a "webdir" is a directory relative to /var/www/html.
+REQUIRED_ENTRIES = (
+    ('baseuri', 'baseuri', None, 'The "baseuri" must be supplied in the configuration file.'),
+    ('deriva_imaging_server', None, None, 'The "deriva_imaging_server" must be supplied in the configuration file.'),
+    ('credentials_file', None, None, 'The "credendential_file" must be provided in the configuration file and exists.'),
+    ('hatrac_template', 'hatrac_template', None, 'The "hatrac_template" must be provided in the configuration file.'),
+    ('iiif_url', 'iiif_url', None, 'The "iiif_url" must be provided in the configuration file.'),
+    ('data_scratch', 'data_scratch', 'dir', 'The "data_scratch" directory must be provided in the configuration file and exists.'),
+    ('images', 'images', 'webdir', 'The "images" directory must be provided in the configuration file and exists.'),
+    ('output_metadata', 'output_metadata', 'webdir', 'The "output_metadata" directory must be provided in the configuration file and exists.'),
+    ('model_file', None, None, 'The "model_file" must be provided in the configuration file and exist.'),
+    ('python', 'python_app', 'file', 'The "python" application must be provided in the configuration file and exist.'),
+    ('tiffinfo', 'tiffinfo', 'file', 'The "tiffinfo" application must be provided in the configuration file and exist.'),
+    ('viewer', 'viewer', None, 'The "viewer" application must be provided in the configuration file.')
+)
+
+# The optional configuration entries: (name in the configuration file and in the worker configuration, default)
+OPTIONAL_ENTRIES = (
+    ('processing_dir', None),
+    ('version', 'v1.0'),
+    ('mail_server', None),
+    ('mail_sender', None),
+    ('mail_receiver', None),
+    ('mail_file', None)
+)
+
+# The numeric settings of the worker read from the environment: 
+# (environment variable, name in the worker configuration, default, must be positive)
+ENVIRONMENT_ENTRIES = (
+    ('z_threshold', 'z_threshold', 5, True),
+    ('compression_level', 'compression_level', 80, False),
+    ('tile_size', 'tile_size', 1024, True)
+)
+
+def parse_environment_integer(variable, default, positive):
+    """
+    Return the integer value of an environment variable, or its default.
+    
+    Raises ValueError when the value is not an integer, or when it must be 
+    positive and is not.
+    """
+    
+    value = os.getenv(variable, default)
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError('The "%s" environment variable must be an integer, not "%s".' % (variable, value))
+    if positive and number <= 0:
+        raise ValueError('The "%s" environment variable must be greater than 0, not "%s".' % (variable, value))
+    return number
+
+def _entry_path(kind, value):
+    """
+    Return the filesystem path of a configuration entry of the given kind.
+    """
+    
+    if kind == 'webdir':
+        return '/var/www/html/%s' % value
+    return value
 
-    python_app = cfg.get('python', None)
-    if not python_app or not os.path.isfile(python_app):
-        logger.error('The "python" application must be provided in the configuration file and exist.')
-        return None
+def get_configuration(cfg, logger):
+    """
+    Return the client configuration.
+    """
+    
+    config = {}
+    
+    """
+    Resolve the kind of all the configured paths at once
+    """
+    kinds = get_path_kinds([_entry_path(kind, cfg.get(key)) for key, name, kind, error in REQUIRED_ENTRIES if kind != None and cfg.get(key)])
+    
+    """
+    Check every entry before giving up, so that all the errors are reported at once
+    """
+    errors = []
+    for key, name, kind, error in REQUIRED_ENTRIES:
+        value = cfg.get(key, None)
+        if not value or (kind != None and kinds.get(_entry_path(kind, value)) != ('file' if kind == 'file' else 'dir')):
+            errors.append(error)
+        elif name != None:
+            config[name] = value
+
+    for key, default in OPTIONAL_ENTRIES:
+        config[key] = cfg.get(key, default)
+
+    for variable, name, default, positive in ENVIRONMENT_ENTRIES:
+        try:
+            config[name] = parse_environment_integer(variable, default, positive)
+        except ValueError as e:
+            errors.append(str(e))
 
-    config['python_app'] = python_app
+    if cfg.get('credentials_file') and cfg.get('deriva_imaging_server'):
+        try:
+            cookie = load_credentials(cfg['credentials_file'], cfg['deriva_imaging_server'])['cookie']
+            if not cookie:
+                errors.append('The ermrest cookie could not be identified.')
+            else:
+                config['cookie'] = cookie
+        except (OSError, ValueError) as e:
+            errors.append('The "credendential_file" must be provided in the configuration file and exists: %s' % e)
+        except (KeyError, TypeError):
+            errors.append('The ermrest cookie could not be identified.')
 
-    tiffinfo = cfg.get('tiffinfo', None)
-    if not tiffinfo or not os.path.isfile(tiffinfo):
-        logger.error('The "tiffinfo" application must be provided in the configuration file and exist.')
-        return None
+    if 'hatrac_template' in config:
+        try:
+            config['hatrac_format'] = compile_template(config['hatrac_template'])
+        except ValueError as e:
+            errors.append('Malformed "hatrac_template" in the configuration file: %s' % e)
 
-    config['tiffinfo'] = tiffinfo
+    if cfg.get('model_file'):
+        try:
+            config['model'] = load_json_cached(cfg['model_file'], MODEL_KEYS)
+        except (OSError, ValueError) as e:
+            errors.append('The "model_file" must be provided in the configuration file and exist: %s' % e)
 
-    viewer = cfg.get('viewer', None)
-    if not viewer:
-        logger.error('The "viewer" application must be provided in the configuration file.')
+    if errors:
+        for error in errors:
+            logger.error(error)
         return None
 
-    config['viewer'] = viewer
+    # resolve any symlinks once, not on every tiffinfo execution
+    config['tiffinfo'] = os.path.realpath(config['tiffinfo'])
 
-    version = cfg.get('version', 'v1.0')
-    config['version'] = version
+    config['logger'] = logger
+    
+    return config
 
-    mail_server = cfg.get('mail_server', None)
-    config['mail_server'] = mail_server
+def check_configuration(cfg):
+    """
+    Validate a loaded configuration, reporting the errors on stderr.
+    
+    Nothing is processed and no connection is made. Returns the exit status.
+    """
+    
+    check_logger = logging.getLogger('%s.check' % __name__)
+    check_logger.propagate = False
+    if not check_logger.handlers:
+        check_logger.addHandler(logging.StreamHandler(sys.stderr))
+    if cfg == None or get_configuration(cfg, check_logger) == None:
+        return 1
+    sys.stdout.write('The configuration is valid.\n')
+    return 0
 
-    mail_sender = cfg.get('mail_sender', None)
-    config['mail_sender'] = mail_sender
+USAGE = 'usage: deriva-imaging-client --config <config-file> (--rid <rid> | --check)\n'
 
-    mail_receiver = cfg.get('mail_receiver', None)
-    config['mail_receiver'] = mail_receiver
+HELP = USAGE + """
+Tool to process deriva images.
 
-    mail_file = cfg.get('mail_file', None)
-    config['mail_file'] = mail_file
+options:
+  -h, --help            show this help message and exit
+  --config CONFIG       The JSON configuration file.
+  --rid RID             The RID of the parent table.
+  --check               Only validate the configuration file.
+"""
 
-    config['logger'] = logger
+def parse_arguments(argv):
+    """
+    Parse the command line options into a dictionary.
     
-    return config
+    Accepts "--option value" and "--option=value". Returns None on a 
+    malformed command line or when an option is missing.
+    """
+    
+    args = {'config': None, 'rid': None, 'check': False}
+    it = iter(argv)
+    for arg in it:
+        if arg == '--check':
+            args['check'] = True
+            continue
+        name, sep, value = arg.partition('=')
+        if name not in ('--config', '--rid'):
+            return None
+        if not sep:
+            value = next(it, None)
+            if value == None:
+                return None
+        args[name[2:]] = value
+    if args['config'] == None or (args['rid'] == None and not args['check']):
+        return None
+    return args
 
 def main():
-    parser = argparse.ArgumentParser(description='Tool to process deriva images.')
-    parser.add_argument( '--config', action='store', type=str, help='The JSON configuration file.', required=True)
-    parser.add_argument( '--rid', action='store', type=str, help='The RID of the parent table.', required=True)
-    args = parser.parse_args()
+    if '-h' in sys.argv[1:] or '--help' in sys.argv[1:]:
+        sys.stdout.write(HELP)
+        return 0
+    args = parse_arguments(sys.argv[1:])
+    if args == None:
+        sys.stderr.write(USAGE)
+        sys.stderr.write('error: --config must be given with a value, and either --rid with a value or --check\n')
+        return 2
+    if args['check']:
+        return check_configuration(load(args['config']))
     
     try:
-        config = load(args.config)
+        config = load(args['config'])
         if config != None:
             deriva_worker_configuration = get_configuration(config, logger)
             if deriva_worker_configuration != None:
-                try:
-                    deriva_imaging_worker = DerivaImagingWorker(deriva_worker_configuration)
-                    returnStatus = deriva_imaging_worker.processImage(args.rid)
-                    logger.debug('Return Status: {}'.format(returnStatus))
-                    return returnStatus
-                except:
-                    et, ev, tb = sys.exc_info()
-                    sys.stderr.write('got exception "%s"' % str(ev))
-                    sys.stderr.write('%s' % ''.join(traceback.format_exception(et, ev, tb)))
-                    sys.stderr.write('\nusage: deriva-imaging-client --config <config-file> --rid <rid>\n\n')
-                    return 1
-    except:
-        et, ev, tb = sys.exc_info()
-        sys.stderr.write('got exception "%s"' % str(ev))
-        sys.stderr.write('%s' % ''.join(traceback.format_exception(et, ev, tb)))
-        sys.stderr.write('\nusage: deriva-imaging-client --config <config-file> --rid <rid>\n\n')
+                # the worker pulls in deriva, lxml and tifffile; only pay for them with a valid configuration
+                from .worker import DerivaImagingWorker
+                deriva_imaging_worker = DerivaImagingWorker(deriva_worker_configuration)
+                returnStatus = deriva_imaging_worker.processImage(args['rid'])
+                logger.debug('Return Status: {}'.format(returnStatus))
+                return returnStatus
+    except Exception:
+        logger.exception('got exception for RID="%s"', args['rid'])
+        sys.stderr.write('got exception "%s"\n\n%s\n' % (str(sys.exc_info()[1]), USAGE))
         return 1
 
 
@@ -1,30 +1,18 @@
 #!/usr/bin/python
 
-import os
-import json
-from deriva.core import PollingErmrestCatalog, init_logging
-import subprocess
+from deriva.core import PollingErmrestCatalog
 import logging
 import socket
 import sys
-import traceback
+import threading
+import time
 import argparse
-from .worker import DerivaImagingWorker
-from .client import get_configuration
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from .client import get_configuration, load, load_credentials, check_configuration, parse_environment_integer
 
 
-# Loglevel dictionary
-__LOGLEVEL = {
-    'critical': logging.FATAL,
-    'fatal': logging.CRITICAL,
-    'error': logging.ERROR,
-    'warning': logging.WARNING,
-    'info': logging.INFO,
-    'debug': logging.DEBUG
-}
-
-FORMAT = '%(asctime)s: %(levelname)s <%(module)s>: %(message)s'
-
 logger = logging.getLogger(__name__)
 config = None
 deriva_worker_configuration = None
@@ -42,9 +30,14 @@ class WorkUnit (object):
             put_claim_url,
             put_update_baseurl,
             run_row_job,
-            claim_input_data=lambda row: {'RID': row['RID'], config['image_processing_status']: "in progress"},
-            failure_input_data=lambda row, e: {'RID': row['RID'], config['image_processing_status']: "error"}
+            status_column,
+            claim_input_data=None,
+            failure_input_data=None
     ):
+        if claim_input_data == None:
+            claim_input_data = lambda row: {'RID': row['RID'], status_column: "in progress"}
+        if failure_input_data == None:
+            failure_input_data = lambda row, e: {'RID': row['RID'], status_column: "error"}
         self.get_claimable_url = get_claimable_url
         self.put_claim_url = put_claim_url
         self.put_update_baseurl = put_update_baseurl
@@ -55,28 +48,80 @@ class WorkUnit (object):
 
 _work_units = []
 
+# The (configuration, DerivaImagingWorker) shared by the rows, and the lock
+# serializing its use by the concurrently polled work units
+_imaging_worker = None
+_imaging_worker_lock = threading.Lock()
+
+class KeepAliveAdapter (HTTPAdapter):
+    """HTTP adapter enabling TCP keepalive on its pooled connections.
+
+    The catalog is polled every few minutes, so without keepalive probes
+    an idle connection may be silently dropped by a firewall or NAT and the
+    next poll has to pay for a fresh TCP and TLS handshake.
+    """
+
+    socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + \
+        ([(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)] if hasattr(socket, 'TCP_KEEPIDLE') else [])
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.socket_options
+        super(KeepAliveAdapter, self).init_poolmanager(*args, **kwargs)
+
+def tune_session(session, pool_size):
+    """
+    Replace the https adapter of a catalog session with a keepalive one, 
+    sized for pool_size concurrent requests and keeping the retry policy.
+    """
+    max_retries = session.get_adapter('https://').max_retries
+    session.mount('https://', KeepAliveAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries))
+
 def image_row_job(handler):
     """
     Generate a tiled pyramid from a tiff file of the original Image table.
     """
     tiff_row_job(handler)
     
+def process_row(rid, filename, configuration):
+    """
+    Generate the tiled pyramid of a single row.
+    
+    The row is processed by the imaging worker shared by this process (see
+    get_imaging_worker), which holds a requests session and a catalog, so it
+    cannot be dispatched to another process. The rows are run one at a time,
+    under _imaging_worker_lock: the worker changes the current directory and
+    empties the shared data_scratch and images directories, so two images
+    processed at once would remove each other's files.
+    """
+    logger.info('Running job for generating a tiled pyramid for RID="%s" and Filename="%s".' % (rid, filename)) 
+    with _imaging_worker_lock:
+        return get_imaging_worker(configuration).processImage(rid)
+    
+def get_imaging_worker(configuration):
+    """
+    Return the imaging worker of this process, built on first use.
+    
+    Building a worker sets up its catalog and hatrac clients and resolves the
+    host address, so it is reused for all the rows processed with the same 
+    configuration; the worker resets its per-image state in processImage.
+    """
+    global _imaging_worker
+    if _imaging_worker == None or _imaging_worker[0] is not configuration:
+        # deferred, so that a server failing on its configuration never loads the image libraries
+        from .worker import DerivaImagingWorker
+        _imaging_worker = (configuration, DerivaImagingWorker(configuration))
+    return _imaging_worker[1]
+    
 def tiff_row_job(handler):
     """
     Run the script for generating jpg image.
     """
     
+    row = handler.row
     try:
-        row = handler.row
-        unit = handler.unit
-        
-        logger.info('Running job for generating a tiled pyramid for RID="%s" and Filename="%s".' % (row['RID'], row[config['original_file_name']])) 
-        deriva_imaging_worker = DerivaImagingWorker(deriva_worker_configuration)
-        returncode = deriva_imaging_worker.processImage(row['RID'])
-    except:
-        et, ev, tb = sys.exc_info()
-        logger.error('got unexpected exception "%s"' % str(ev))
-        logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+        returncode = process_row(row['RID'], row[config['original_file_name']], deriva_worker_configuration)
+    except Exception:
+        logger.exception('got unexpected exception for RID="%s"', row['RID'])
         returncode = 1
         
     if returncode != 0:
@@ -105,64 +150,100 @@ class Worker (object):
 
         On error, set Processing_Status="failed: reason"
 
+        Result:
+         true: there might be more work to claim
+         false: we failed to find any work
+        """
+        # the units poll the catalog independently, so their HTTP round-trips can overlap
+        if len(cls.work_units) > 1:
+            with ThreadPoolExecutor(max_workers=len(cls.work_units)) as executor:
+                results = list(executor.map(cls._poll_unit, cls.work_units))
+        else:
+            results = [cls._poll_unit(unit) for unit in cls.work_units]
+
+        return any(results)
+
+    @classmethod
+    def _poll_unit(cls, unit):
+        """Find, claim, and process work for one work unit.
+
         Result:
          true: there might be more work to claim
          false: we failed to find any work
         """
         found_work = False
 
-        for unit in cls.work_units:
-            # this handled concurrent update for us to safely and efficiently claim a record
+        # this handled concurrent update for us to safely and efficiently claim a record
+        try:
+            unit.idle_etag, batch = cls.catalog.state_change_once(
+                unit.get_claimable_url,
+                unit.put_claim_url,
+                unit.claim_input_data,
+                unit.idle_etag
+            )
+        except:
+            # keep going if we have a broken WorkUnit
+            return found_work
+        # batch may be empty if no work was found...
+        # the failure status of a row is sent as soon as it fails, so that a
+        # process killed in the middle of a batch cannot lose it
+        for row, claim in batch:
+            found_work = True
             try:
-                unit.idle_etag, batch = cls.catalog.state_change_once(
-                    unit.get_claimable_url,
-                    unit.put_claim_url,
-                    unit.claim_input_data,
-                    unit.idle_etag
-                )
-            except:
-                # keep going if we have a broken WorkUnit
-                continue
-            # batch may be empty if no work was found...
-            for row, claim in batch:
-                found_work = True
-                try:
-                    handler = cls(row, unit)
-                    unit.run_row_job(handler)
-                except WorkerBadDataError as e:
-                    logger.error("Aborting task %s on data error: %s\n" % (row["RID"], e))
-                    cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
-                    # continue with next task...?
-                except WorkerRuntimeError as e:
-                    logger.error("Aborting task %s on data error: %s\n" % (row["RID"], e))
-                    cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
-                    # continue with next task...?
-                except Exception as e:
-                    cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
-                    raise
+                handler = cls(row, unit)
+                unit.run_row_job(handler)
+            except WorkerBadDataError as e:
+                logger.error("Aborting task %s on data error: %s\n" % (row["RID"], e))
+                cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
+                # continue with next task...?
+            except WorkerRuntimeError as e:
+                logger.error("Aborting task %s on data error: %s\n" % (row["RID"], e))
+                cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
+                # continue with next task...?
+            except Exception as e:
+                cls.catalog.put(unit.put_claim_url, json=[unit.failure_input_data(row, e)])
+                raise
 
         return found_work
 
+    min_poll_seconds = 1
+
     @classmethod
     def blocking_poll(cls):
-        return cls.catalog.blocking_poll(cls.look_for_work, polling_seconds=cls.poll_seconds)
+        """Poll for work forever.
+
+        Poll again right away while work is found. Once the catalog is idle,
+        wait min_poll_seconds and double the wait after each idle poll, up to
+        poll_seconds, so work queued shortly after a batch is picked up
+        quickly without polling an idle catalog at a high rate.
+        """
+        interval = cls.min_poll_seconds
+        while True:
+            if cls.look_for_work():
+                interval = cls.min_poll_seconds
+                continue
+            time.sleep(interval)
+            interval = min(interval * 2, cls.poll_seconds)
 
 def main():
     global config, logger, deriva_worker_configuration, _work_units
     
     parser = argparse.ArgumentParser(description='Tool to process deriva images.')
     parser.add_argument( '--config', action='store', type=str, help='The JSON configuration file.', required=True)
+    parser.add_argument( '--check', action='store_true', help='Only validate the configuration file.')
     args = parser.parse_args()
-    with open(args.config, 'r') as f:
-        config = json.load(f)
-    loglevel = config.get('loglevel', None)
-    if loglevel:
-        loglevel = __LOGLEVEL.get(loglevel, None)
-    logfile = config.get('log', None)
-    if loglevel and logfile:
-        init_logging(level=loglevel, log_format=FORMAT, file_path=logfile)
-    else:
-        logging.getLogger().addHandler(logging.NullHandler())
+    # longest wait between two idle polls; 0 would poll the catalog in a busy loop
+    try:
+        poll_seconds = parse_environment_integer('DERIVA_IMAGING_POLL_SECONDS', 300, True)
+    except ValueError as e:
+        sys.stderr.write('%s\n' % e)
+        return 1
+    # a missing or malformed file is reported by load(), which also sets up the logging
+    config = load(args.config)
+    if args.check:
+        return check_configuration(config)
+    if config == None:
+        return 1
     deriva_worker_configuration = get_configuration(config, logger)
     if deriva_worker_configuration == None:
         return 1
@@ -171,7 +252,8 @@ def main():
             config['get_claimable_url'],
             config['put_claim_url'],
             config['put_update_baseurl'],
-            image_row_job
+            image_row_job,
+            config['image_processing_status']
         )
     )
     
@@ -179,9 +261,7 @@ def main():
 
     # secret session cookie
     credfile = config['credentials_file']
-    credentials = json.load(open(credfile))
-    if 'cookie' not in credentials.keys():
-        credentials = credentials[servername]
+    credentials = load_credentials(credfile, servername)
 
 
     # these are peristent/logical connections so we create once and reuse
@@ -193,7 +273,9 @@ def main():
         credentials
     )
     catalog.dcctx['cid'] = 'pipeline/image/2D/tiff'
-    Worker.poll_seconds = int(os.getenv('DERIVA_IMAGING_POLL_SECONDS', '300'))
+    # one connection per concurrently polled work unit, but no fewer than the requests default
+    tune_session(catalog._session, max(len(_work_units), 10))
+    Worker.poll_seconds = poll_seconds
     Worker.catalog = catalog
     Worker.blocking_poll()
     return 0
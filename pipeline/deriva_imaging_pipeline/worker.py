@@ -37,12 +37,20 @@ from lxml import etree
 from socket import gaierror, EAI_AGAIN
 import mimetypes
 import tempfile
+import warnings
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 from deriva.core import PollingErmrestCatalog, HatracStore, urlquote
 from deriva.core.utils import hash_utils as hu
 from deriva.core.utils.core_utils import DEFAULT_CHUNK_SIZE
 
+import requests
 from requests.exceptions import HTTPError
+import urllib3
 from http import HTTPStatus
 
 import xml.etree.ElementTree as ET
@@ -58,22 +66,30 @@ store_ome = False
 thumbnail_size=96
 inches_per_meter = 39.3701
 BF_ENV = dict(os.environ, **{'BF_MAX_MEM': '24g'})
+
+# Host name from the environment, read once per process; the numeric
+# settings are read and checked with the configuration (see client.ENVIRONMENT_ENTRIES)
+HOST_SERVER = os.getenv('DERIVA_PIPELINE_HOSTNAME', socket.gethostname())
 uuid = b'urn:uuid:'
 endTokens = [b'"', b'<']   
 ISI_NETWORK = '128.9' 
 
+# Connect and read timeouts, in seconds, of the IIIF checks
+IIIF_TIMEOUT = (10, 120)
+
 class DerivaImagingWorker (object):
     """Network client for generating tiled pyramid images.
     """
 
     def __init__(self, kwargs):
-        self.missing_scenes = False
-        self.z_threshold = os.getenv('z_threshold', 5)
+        self.resetImageState()
+        self.z_threshold = kwargs.get('z_threshold')
         self.model = kwargs.get('model')
         self.hatrac_template = kwargs.get('hatrac_template')
+        self.hatrac_format = kwargs.get('hatrac_format')
         self.iiif_url = kwargs.get('iiif_url')
-        self.compression_level = os.getenv('compression_level', 80)
-        self.tile_size = os.getenv('tile_size', 1024)
+        self.compression_level = kwargs.get('compression_level')
+        self.tile_size = kwargs.get('tile_size')
         self.baseuri = kwargs.get('baseuri')
         o = urlparse(self.baseuri)
         self.scheme = o[0]
@@ -90,13 +106,6 @@ class DerivaImagingWorker (object):
         self.viewer = kwargs.get('viewer')
         self.data_scratch = kwargs.get('data_scratch')
         self.images = kwargs.get('images')
-        self.tiff_images = []
-        self.thumbnail = None
-        self.tiff_files = []
-        self.ome_tiff_images = []
-        self.ome_tiff_files = []
-        self.ome_xml = []
-        self.json = None
         self.output_metadata = kwargs.get('output_metadata')
         self.ns = '{http://www.openmicroscopy.org/Schemas/OME/2016-06}'
         self.image_tag = self.ns + 'Image'
@@ -104,11 +113,8 @@ class DerivaImagingWorker (object):
         self.micrometer = ['\u00b5m', 'µm', '?m']
         self.physicalSizeXUnit = 'PhysicalSizeXUnit'
         self.physicalSizeX = 'PhysicalSizeX'
-        self.resolutions = None
-        self.curl = kwargs.get('curl')
-        self.wget = kwargs.get('wget')
         self.cookie = kwargs.get('cookie')
-        self.host_server = os.getenv('DERIVA_PIPELINE_HOSTNAME', socket.gethostname())
+        self.host_server = HOST_SERVER
         self.hatrac_store = HatracStore(
             self.scheme, 
             self.host,
@@ -122,6 +128,9 @@ class DerivaImagingWorker (object):
             {'cookie': self.cookie}
         )
         self.catalog.dcctx['cid'] = 'pipeline/image/2D/tiff'
+        # like the former "curl -k" checks, the IIIF server certificate is not verified
+        self.http_session = requests.Session()
+        self.http_session.verify = False
         self.mail_server = kwargs.get('mail_server')
         self.mail_sender = kwargs.get('mail_sender')
         self.mail_receiver = kwargs.get('mail_receiver')
@@ -132,6 +141,20 @@ class DerivaImagingWorker (object):
         self.logger = kwargs.get('logger')
         self.logger.debug('Client initialized.')
 
+    """
+    Forget the results of the previously processed image, so that one worker can process many images
+    """
+    def resetImageState(self):
+        self.missing_scenes = False
+        self.tiff_images = []
+        self.thumbnail = None
+        self.tiff_files = []
+        self.ome_tiff_images = []
+        self.ome_tiff_files = []
+        self.ome_xml = []
+        self.json = None
+        self.resolutions = None
+
     """
     Send email notification
     """
@@ -163,12 +186,10 @@ class DerivaImagingWorker (object):
                         ready = True
                     if ready:
                         et, ev, tb = sys.exc_info()
-                        self.logger.error('got exception "%s"' % str(ev))
-                        self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                        self.logger.exception('got exception "%s"' % str(ev))
                 except:
                     et, ev, tb = sys.exc_info()
-                    self.logger.error('got exception "%s"' % str(ev))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                    self.logger.exception('got exception "%s"' % str(ev))
                     ready = True
         elif self.mail_file != None:
             """
@@ -319,6 +340,8 @@ class DerivaImagingWorker (object):
     Main function to process the image
     """
     def processImage(self, rid):
+        self.resetImageState()
+        
         """
         Cleanup the working directories
         """
@@ -337,7 +360,7 @@ class DerivaImagingWorker (object):
         resp = self.catalog.get(url)
         resp.raise_for_status()
         row = resp.json()[0]
-        self.hatrac_prefix = self.hatrac_template.format(**row)
+        self.hatrac_prefix = self.hatrac_format(row)
         filename = row[self.model['primary_file_name']]
         file_url = row[self.model['primary_file_url']]
         primary_row = row
@@ -561,8 +584,7 @@ class DerivaImagingWorker (object):
             return hatracFile
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got unexpected exception "%s"' % str(ev))
-            self.logger.error('{}'.format(''.join(traceback.format_exception(et, ev, tb))))
+            self.logger.exception('got unexpected exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: HATRAC GET ERROR', 'RID: {}\n{}\n'.format((rid, ''.join(traceback.format_exception(et, ev, tb)))))
             os.remove(hatracFile)
             return None
@@ -617,8 +639,7 @@ class DerivaImagingWorker (object):
             self.logger.debug('The base MD5 of the file {} is:{}'.format(file_name, md5))
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('Can not get the base MD5 of the file "%s". Error: "%s"' % (file_name, str(ev)))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('Can not get the base MD5 of the file "%s". Error: "%s"' % (file_name, str(ev)))
             fw.close()  
              
         self.logger.debug('Removing file "%s"' % (outfile))
@@ -726,8 +747,7 @@ class DerivaImagingWorker (object):
             except:
                 pyramid['Pixels_Per_Meter'] = None
                 self.logger.info('No Pixels_Per_Meter found for file {}.'.format(pyramid['name']))
-                et, ev, tb = sys.exc_info()
-                self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                self.logger.exception('Can not get Pixels_Per_Meter for file {}.'.format(pyramid['name']))
                 
             if pyramid['series_details']['Thumbnail series'] == True:
                 continue
@@ -998,8 +1018,7 @@ class DerivaImagingWorker (object):
                                                        )
                 except:
                     et, ev, tb = sys.exc_info()
-                    self.logger.error('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                    self.logger.exception('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
                     self.sendMail('FAILURE IMAGE PROCESSING: HATRAC PUT ERROR', 'RID: %s\nCan not upload file "%s" in hatrac "%s". Error: "%s"' % (rid, file_name, new_uri, ''.join(traceback.format_exception(et, ev, tb))))
                     return 1
                 
@@ -1023,8 +1042,8 @@ class DerivaImagingWorker (object):
                 }
             config_tiffinfo = {}
             self.logger.debug('pixels_per_meter: {}'.format(pyramid['Pixels_Per_Meter']))
-            self.logger.debug('getMeterScaleInPixels: {}'.format(self.getMeterScaleInPixels(file_name, rid)))
             pixels_per_meter = self.getMeterScaleInPixels(file_name, rid)
+            self.logger.debug('getMeterScaleInPixels: {}'.format(pixels_per_meter))
             if pixels_per_meter != None:
                 config_tiffinfo['pixels_per_meter'] = pixels_per_meter
                 
@@ -1145,7 +1164,7 @@ class DerivaImagingWorker (object):
         Build now the Processed_Image records
         """
         for pyramid in self.tiff_files:
-            if 'row' in pyramid.keys():
+            if 'row' in pyramid:
                 if self.createEntity('{}:{}'.format(urlquote(self.model['image_schema']), urlquote(self.model['processed_image'])), pyramid['row'], rid) == None:
                     return 1
                 
@@ -1207,8 +1226,7 @@ class DerivaImagingWorker (object):
                                                        )
                 except:
                     et, ev, tb = sys.exc_info()
-                    self.logger.error('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                    self.logger.exception('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
                     self.sendMail('FAILURE IMAGE PROCESSING: HATRAC PUT ERROR', 'RID: %s\nCan not upload file "%s" in hatrac "%s". Error: "%s"' % (rid, file_name, new_uri, ''.join(traceback.format_exception(et, ev, tb))))
                     return 1
 
@@ -1255,66 +1273,44 @@ class DerivaImagingWorker (object):
     Check that the info.json can be accessed
     """
     def checkInfoJSON(self, rid):
-        for file_name in self.tiff_images:
-            file_path = '/var/www/html/%s%s%s' % (self.images, os.sep, file_name)
-            if os.path.isfile(file_path):
-                args = [self.curl, '-s', '-k', '-w', '%{http_code}', '-o', '/dev/null', '{}/{}/info.json'.format(self.iiif_url, urlquote('https://{}/{}/{}'.format(self.host_server, self.images, urlquote(file_name))))]
-                try:
-                    self.logger.debug('Executing:\n%s' % (' '.join(args)))
-                    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdoutdata, stderrdata = p.communicate()
-                    returncode = p.returncode
-                    if returncode == 0:
-                        http_status_code = int (stdoutdata)
-                        if http_status_code != 200:
-                            self.logger.error('File "%s" has returned HTTP Status Code %d' % (file_name, http_status_code))
-                            self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkInfoJSON):\n%s\nhas returned HTTP Status Code %d for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), http_status_code, file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
-                            return 1
-                    else:
-                        self.logger.error('Returned code %d' % (returncode))
-                        self.logger.error('stdout: %s' % stdoutdata.decode('utf-8'))
-                        self.logger.error('stderr: %s' % stderrdata.decode('utf-8'))
-                        self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkInfoJSON):\n%s \nhas returned %d for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), returncode, file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
-                        return 1
-                except:
-                    et, ev, tb = sys.exc_info()
-                    self.logger.error('got unexpected exception "%s"' % str(ev))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
-                    self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkInfoJSON):\n%s \ncould not be executed for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
-                    return 1
-
-        return 0
+        return self.checkIIIFURL('info.json', 'checkInfoJSON', rid)
         
     """
     Check that the thumbnail can be accessed
     """
     def checkThumbnailURL(self, rid):
+        return self.checkIIIFURL('full/,100/0/default.jpg', 'checkThumbnailURL', rid)
+        
+    """
+    Return the HTTP status code of an IIIF request.
+    The response is streamed and closed without reading its body; the IIIF server
+    certificate is not verified, and the warning about it is only silenced for this request.
+    """
+    def getIIIFStatus(self, url):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', urllib3.exceptions.InsecureRequestWarning)
+            with self.http_session.get(url, stream=True, timeout=IIIF_TIMEOUT) as response:
+                return response.status_code
+
+    """
+    Check that an IIIF request can be served for each converted file
+    """
+    def checkIIIFURL(self, iiif_request, check_name, rid):
         for file_name in self.tiff_images:
             file_path = '/var/www/html/%s%s%s' % (self.images, os.sep, file_name)
             if os.path.isfile(file_path):
-                args = [self.curl, '-s', '-k', '-w', '%{http_code}', '-o', '/dev/null', '{}/{}/full/,100/0/default.jpg'.format(self.iiif_url, urlquote('https://{}/{}/{}'.format(self.host_server, self.images, urlquote(file_name))))]
+                url = '{}/{}/{}'.format(self.iiif_url, urlquote('https://{}/{}/{}'.format(self.host_server, self.images, urlquote(file_name))), iiif_request)
                 try:
-                    self.logger.debug('Executing:\n%s' % (' '.join(args)))
-                    p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    stdoutdata, stderrdata = p.communicate()
-                    returncode = p.returncode
-                    if returncode == 0:
-                        http_status_code = int (stdoutdata)
-                        if http_status_code != 200:
-                            self.logger.error('File "%s" has returned HTTP Status Code %d' % (file_name, http_status_code))
-                            self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkThumbnailURL):\n%s\nhas returned HTTP Status Code %d for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), http_status_code, file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
-                            return 1
-                    else:
-                        self.logger.error('Returned code %d' % (returncode))
-                        self.logger.error('stdout: %s' % stdoutdata.decode('utf-8'))
-                        self.logger.error('stderr: %s' % stderrdata.decode('utf-8'))
-                        self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkThumbnailURL):\n%s \nhas returned %d for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), returncode, file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
+                    self.logger.debug('Requesting:\n%s' % (url))
+                    http_status_code = self.getIIIFStatus(url)
+                    if http_status_code != 200:
+                        self.logger.error('File "%s" has returned HTTP Status Code %d' % (file_name, http_status_code))
+                        self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nHTTP request (%s):\n%s\nhas returned HTTP Status Code %d for the file "%s".\n' % (rid, check_name, url, http_status_code, file_name))
                         return 1
                 except:
                     et, ev, tb = sys.exc_info()
-                    self.logger.error('got unexpected exception "%s"' % str(ev))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
-                    self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nCurl command (checkThumbnailURL):\n%s \ncould not be executed for the file "%s".\nstdoutdata: %s\nstderrdata: %s\n' % (rid, ' '.join(args), file_name, stdoutdata.decode('utf-8'), stderrdata.decode('utf-8')))
+                    self.logger.exception('got unexpected exception "%s"' % str(ev))
+                    self.sendMail('FAILURE IMAGE PROCESSING: HTTP ERROR', 'RID: %s\nHTTP request (%s):\n%s \ncould not be executed for the file "%s".\nerror: %s\n' % (rid, check_name, url, file_name, str(ev)))
                     return 1
 
         return 0
@@ -1335,14 +1331,14 @@ class DerivaImagingWorker (object):
                 if pixels is None:
                     self.logger.debug('Not found "pixels" attributes')
                     continue
-                if self.physicalSizeXUnit not in pixels.keys():
+                if self.physicalSizeXUnit not in pixels:
                     self.logger.debug('Not found "physicalSizeXUnit" attribute')
                     continue
                 physicalSizeXUnit = pixels[self.physicalSizeXUnit]
                 if physicalSizeXUnit not in self.micrometer:
                     self.logger.debug('Unknown physicalSizeXUnit: {}'.format(physicalSizeXUnit))
                     continue
-                if self.physicalSizeX not in pixels.keys():
+                if self.physicalSizeX not in pixels:
                     self.logger.debug('"PhysicalSizeX" attribute is missing')
                     continue
                 physicalSizeX = pixels[self.physicalSizeX]
@@ -1355,8 +1351,7 @@ class DerivaImagingWorker (object):
             return resolutions
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got unexpected exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got unexpected exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: Can not get the resolution', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return None
     """
@@ -1374,8 +1369,7 @@ class DerivaImagingWorker (object):
             
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got unexpected exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got unexpected exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: Can not get the resolution', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return None
     """
@@ -1394,8 +1388,7 @@ class DerivaImagingWorker (object):
                 self.logger.debug('extract_scenes failed')
                 self.logger.error('Can not extract_scenes for file "{}", RID: "{}".\n'.format(filename, rid)) 
                 et, ev, tb = sys.exc_info()
-                self.logger.error('got convert exception "{}"'.format(ev))
-                self.logger.error('{}'.format(''.join(traceback.format_exception(et, ev, tb))))
+                self.logger.exception('got convert exception "{}"'.format(ev))
                 self.sendMail('FAILURE IMAGE PROCESSING: Extract Scenes failed', 'RID: {}\nCan not extract_scenes for file {}.\n{}\n{}'.format(rid, filename, ev, ''.join(traceback.format_exception(et, ev, tb))))
                 os.remove(filename)
                 return 1
@@ -1408,9 +1401,8 @@ class DerivaImagingWorker (object):
                     self.logger.debug('Removing directory "%s"' % (entry.path))
                     shutil.rmtree(entry.path)
                 elif entry.is_file() and entry.path.endswith('.json'):
-                    f = open(entry.path, 'r')
-                    series_details = json.load(f)
-                    f.close()
+                    with open(entry.path, 'rb') as f:
+                        series_details = json_loads(f.read())
                     series_details = sorted(series_details, key=lambda obj: obj['Number'])
                     self.json = entry.name
 
@@ -1453,7 +1445,7 @@ class DerivaImagingWorker (object):
                     except:
                         pass
             
-            if self.physicalSizeXUnit in series_details[0].keys() and self.physicalSizeX in series_details[0].keys():
+            if self.physicalSizeXUnit in series_details[0] and self.physicalSizeX in series_details[0]:
                 if series_details[0][self.physicalSizeXUnit] in self.micrometer:
                     self.resolutions = [(int) (10**6 / float(series_details[0][self.physicalSizeX]))]
                     
@@ -1479,7 +1471,7 @@ class DerivaImagingWorker (object):
                         series_properties = {}
                         crt_series = series_details[int(series)]
                         for key in ['SizeX', 'SizeY', 'SizeZ', 'SizeT', 'SizeC', 'PhysicalSizeX', 'PhysicalSizeY', 'PhysicalSizeZ', 'PhysicalSizeXUnit', 'PhysicalSizeYUnit', 'PhysicalSizeZUnit', 'X', 'Y', 'Z', 'XUnit', 'YUnit', 'ZUnit']:
-                            if key in crt_series.keys():
+                            if key in crt_series:
                                 series_properties[key] = crt_series[key]
                         series_properties['SizeC'] = len(series_details[int(series)]['Channels'])
 
@@ -1541,8 +1533,7 @@ class DerivaImagingWorker (object):
             return 0
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got unexpected exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got unexpected exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: CONVERT TO PYRAMID ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             try:
                 os.remove('{}/.{}.bfmemo'.format(os.path.dirname(filename), os.path.basename(filename)))
@@ -1570,8 +1561,7 @@ class DerivaImagingWorker (object):
             return 0
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: STATE CHANGE ONCE ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return 1
             
@@ -1596,14 +1586,12 @@ class DerivaImagingWorker (object):
                 return 0
             else:
                 et, ev, tb = sys.exc_info()
-                self.logger.error('got exception "%s"' % str(ev))
-                self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                self.logger.exception('got exception "%s"' % str(ev))
                 self.sendMail('FAILURE IMAGE PROCESSING: DELETE ENTITY ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
                 return 1
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: DELETE ENTITY ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return 1
 
@@ -1626,8 +1614,7 @@ class DerivaImagingWorker (object):
             return url
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: CREATE ENTITY ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return None
 
@@ -1650,8 +1637,7 @@ class DerivaImagingWorker (object):
             return new_rid
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: CREATE ENTITY ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return None
 
@@ -1735,16 +1721,14 @@ class DerivaImagingWorker (object):
                                                        )
                 except:
                     et, ev, tb = sys.exc_info()
-                    self.logger.error('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
-                    self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+                    self.logger.exception('Can not upload file "%s" in hatrac "%s". Error: "%s"' % (file_name, new_uri, str(ev)))
                     self.sendMail('FAILURE IMAGE PROCESSING: HATRAC PUT ERROR', 'RID: %s\nCan not upload file "%s" in hatrac "%s". Error: "%s"' % (rid, file_name, new_uri, ''.join(traceback.format_exception(et, ev, tb))))
                     return (None, None, None, None)
             return (hatrac_URI, file_name, file_size, hexa_md5)
 
         except:
             et, ev, tb = sys.exc_info()
-            self.logger.error('got unexpected exception "%s"' % str(ev))
-            self.logger.error('%s' % ''.join(traceback.format_exception(et, ev, tb)))
+            self.logger.exception('got unexpected exception "%s"' % str(ev))
             self.sendMail('FAILURE IMAGE PROCESSING: HATRAC STORE ERROR', 'RID: %s\n%s\n' % (rid, ''.join(traceback.format_exception(et, ev, tb))))
             return (None, None, None, None)
         
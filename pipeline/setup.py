@@ -41,6 +41,10 @@ setup(
               'lxml',
               'deriva'
               ],
+    extras_require={
+        # faster JSON parsing, and streaming of the model file
+        'fast': ['orjson', 'ijson']
+    },
     license='Apache 2.0',
     classifiers=[
         'Intended Audience :: Developers',
@@ -7,17 +7,25 @@ Usage:
 
     python3 schema_updates.py <hostname> <catalog_number> <credentials_file>
 
+With --dry-run, the changes are only printed and the catalog is not modified.
+
 """
 
 import argparse
-import json
+import logging
 import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from requests import HTTPError
+from requests.adapters import HTTPAdapter
 from deriva.core import ErmrestCatalog, get_credential
 from deriva.core.ermrest_model import builtin_types, Table, Schema, Key, ForeignKey, Column
-from deriva.core.ermrest_model import tag as chaise_tags
-from ast import literal_eval
+
+logger = logging.getLogger(__name__)
 
 facebase_users = ["https://auth.globus.org/143f5bdc-c127-11e4-ab32-22000a1dd033"]
+
 facebase_admins = ["https://auth.globus.org/3dafcdea-fbfa-11e4-86df-22000aa51e6e","https://dev.facebase.org/webauthn_robot/fb_cron","https://staging.facebase.org/webauthn_robot/fb_cron","https://www.facebase.org/webauthn_robot/fb_cron"]
 facebase_curators = ["https://auth.globus.org/8438a12e-6589-11e7-9091-22000b500e8d","https://dev.facebase.org/webauthn_robot/fb_cron","https://staging.facebase.org/webauthn_robot/fb_cron","https://www.facebase.org/webauthn_robot/fb_cron"]
 facebase_writers = ["https://auth.globus.org/01c7bf28-2622-11e7-9ad7-22000b74c0b7"]
@@ -36,6 +44,25 @@ schema_acls = isa_curation_policy
 restricted_visibility_policy = {"select": curators}
 table_acls = restricted_visibility_policy
 
+"""
+Specifications of the columns and FKs added to existing tables.
+They are plain tuples, so the helpers can also be given (column_name, column_type, default_value, nullok)
+and (foreign_key_columns, reference_schema, reference_table, referenced_columns) tuples.
+"""
+ColumnSpec = namedtuple('ColumnSpec', ['column_name', 'column_type', 'default_value', 'nullok'])
+ForeignKeySpec = namedtuple('ForeignKeySpec', ['foreign_key_columns', 'reference_schema', 'reference_table', 'referenced_columns'])
+
+"""
+Columns and FKs added to the isa:imaging_data table.
+"""
+imaging_data_columns = [
+    ColumnSpec('processing_status', 'text', 'new', True)
+]
+
+imaging_data_foreign_keys = [
+    ForeignKeySpec(['processing_status'], 'vocab', 'processing_status', ['Name'])
+]
+
 source_definitions = {
     "columns": True,
     "fkeys": True,
@@ -57,332 +84,355 @@ virtual_column = {
    }
  }
 
-dataset_suppl_released_guard = """
-{
-    "types": [
-      "select"
-    ],
-    "projection": [
-        %INCLUDE%
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Primary_Table_imaging_data_RID_fkey"
-          ]
-        },
-        {
-          "outbound": [
-            "isa",
-            "imaging_data_dataset_fkey"
-          ]
-        },
-        {
-          "filter": "released",
-          "operator": "=",
-          "operand": True
-        },
-        "RID"
-    ],
-    "projection_type": "nonnull"
-}
 """
+Projection hops shared by the guards of the ACL bindings of the Imaging tables.
+The guards reference these objects instead of owning copies of them.
+"""
+image_primary_table_hop = {
+  "outbound": [
+    "Imaging",
+    "Image_Primary_Table_imaging_data_RID_fkey"
+  ]
+}
 
-dataset_suppl_edit_guard = """
-{
-    "types": [
-      "select",
-      "update",
-      "delete"
-    ],
-    "scope_acl": writers,
-    "projection": [
-        %INCLUDE%
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Primary_Table_imaging_data_RID_fkey"
-          ]
-        },
-        {
-          "outbound": [
-            "isa",
-            "imaging_data_dataset_fkey"
-          ]
-        },
-        {
-          "outbound": [
-            "isa",
-            "dataset_project_fkey"
-          ]
-        },
-        {
-          "outbound": [
-            "isa",
-            "project_groups_fkey"
-          ]
-        },
-        "groups"
-    ],
-    "projection_type": "acl"
+imaging_data_dataset_hop = {
+  "outbound": [
+    "isa",
+    "imaging_data_dataset_fkey"
+  ]
 }
-"""
 
-image_annotation_include = """
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Annotation_Image_fkey"
-          ]
-        },
-"""
+dataset_project_hop = {
+  "outbound": [
+    "isa",
+    "dataset_project_fkey"
+  ]
+}
 
-image_annotation_file_include = """
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Annotation_File_Image_fkey"
-          ]
-        },
-"""
+project_groups_hop = {
+  "outbound": [
+    "isa",
+    "project_groups_fkey"
+  ]
+}
 
-processed_image_include = """
-        {
-          "outbound": [
-            "Imaging",
-            "Processed_Image_Reference_Image_fkey"
-          ]
-        },
-"""
+released_filter = {
+  "filter": "released",
+  "operator": "=",
+  "operand": True
+}
 
-image_z_include = """
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Z_Image_fkey"
-          ]
-        },
-"""
+released_guard_projection = [image_primary_table_hop, imaging_data_dataset_hop, released_filter, "RID"]
+edit_guard_projection = [image_primary_table_hop, imaging_data_dataset_hop, dataset_project_hop, project_groups_hop, "groups"]
 
-image_channel_include = """
-        {
-          "outbound": [
-            "Imaging",
-            "Image_Channel_Image_fkey"
-          ]
-        },
 """
+Guards of the ACL bindings of the Imaging tables.
+The include argument is the projection path from a table to the Image table;
+it is empty for the Image table itself.
+"""
+def dataset_suppl_released_guard(include):
+    return {
+        "types": [
+          "select"
+        ],
+        "projection": include + released_guard_projection,
+        "projection_type": "nonnull"
+    }
 
-image_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', '').replace('writers', str(writers)))
-image_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', '').replace('writers', str(writers)))
-
-image_annotation_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', image_annotation_include).replace('writers', str(writers)))
-image_annotation_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', image_annotation_include).replace('writers', str(writers)))
-
-image_annotation_file_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', image_annotation_file_include).replace('writers', str(writers)))
-image_annotation_file_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', image_annotation_file_include).replace('writers', str(writers)))
-
-processed_image_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', processed_image_include).replace('writers', str(writers)))
-processed_image_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', processed_image_include).replace('writers', str(writers)))
-
-image_z_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', image_z_include).replace('writers', str(writers)))
-image_z_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', image_z_include).replace('writers', str(writers)))
-
-image_channel_dataset_suppl_released_guard = literal_eval(dataset_suppl_released_guard.replace('%INCLUDE%', image_channel_include).replace('writers', str(writers)))
-image_channel_dataset_suppl_edit_guard = literal_eval(dataset_suppl_edit_guard.replace('%INCLUDE%', image_channel_include).replace('writers', str(writers)))
-
-image_acl_bindings = {"dataset_suppl_released_guard": image_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": image_dataset_suppl_edit_guard
-}
-
-image_annotation_acl_bindings = {"dataset_suppl_released_guard": image_annotation_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": image_annotation_dataset_suppl_edit_guard
-}
-
-image_annotation_file_acl_bindings = {"dataset_suppl_released_guard": image_annotation_file_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": image_annotation_file_dataset_suppl_edit_guard
-}
+def dataset_suppl_edit_guard(include):
+    return {
+        "types": [
+          "select",
+          "update",
+          "delete"
+        ],
+        "scope_acl": writers,
+        "projection": include + edit_guard_projection,
+        "projection_type": "acl"
+    }
 
-processed_image_acl_bindings = {"dataset_suppl_released_guard": processed_image_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": processed_image_dataset_suppl_edit_guard
-}
+image_include = []
 
-image_z_acl_bindings = {"dataset_suppl_released_guard": image_z_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": image_z_dataset_suppl_edit_guard
-}
+image_annotation_include = [
+    {
+      "outbound": [
+        "Imaging",
+        "Image_Annotation_Image_fkey"
+      ]
+    }
+]
+
+image_annotation_file_include = [
+    {
+      "outbound": [
+        "Imaging",
+        "Image_Annotation_File_Image_fkey"
+      ]
+    }
+]
+
+processed_image_include = [
+    {
+      "outbound": [
+        "Imaging",
+        "Processed_Image_Reference_Image_fkey"
+      ]
+    }
+]
+
+image_z_include = [
+    {
+      "outbound": [
+        "Imaging",
+        "Image_Z_Image_fkey"
+      ]
+    }
+]
+
+image_channel_include = [
+    {
+      "outbound": [
+        "Imaging",
+        "Image_Channel_Image_fkey"
+      ]
+    }
+]
 
-image_channel_acl_bindings = {"dataset_suppl_released_guard": image_channel_dataset_suppl_released_guard,
-                      "dataset_suppl_edit_guard": image_channel_dataset_suppl_edit_guard
-}
+"""
+ACL bindings of the Imaging tables, built once when the module is loaded.
+"""
+def dataset_suppl_acl_bindings(include):
+    return {
+        "dataset_suppl_released_guard": dataset_suppl_released_guard(include),
+        "dataset_suppl_edit_guard": dataset_suppl_edit_guard(include)
+    }
 
-def add_annotation_source_definitions(catalog, schema_name, table_name, value):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables:
-        table = schema.tables[table_name]
+image_acl_bindings = dataset_suppl_acl_bindings(image_include)
+image_annotation_acl_bindings = dataset_suppl_acl_bindings(image_annotation_include)
+image_annotation_file_acl_bindings = dataset_suppl_acl_bindings(image_annotation_file_include)
+processed_image_acl_bindings = dataset_suppl_acl_bindings(processed_image_include)
+image_z_acl_bindings = dataset_suppl_acl_bindings(image_z_include)
+image_channel_acl_bindings = dataset_suppl_acl_bindings(image_channel_include)
+
+def add_annotation_source_definitions(catalog, schema_name, table_name, value, model=None, apply=True):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables.get(table_name)
+    if table != None:
         table.annotations['tag:isrd.isi.edu,2019:source-definitions'] = value
-        print('Applying source-definitions annotation: {}'.format(value))
-        model.apply()
-        return
+        logger.info('Applying source-definitions annotation: {}'.format(value))
+        if apply == True:
+            table.apply()
+        return True
+    return False
     
-def add_annotation_visible_foreign_keys(catalog, schema_name, table_name, value):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables:
-        table = schema.tables[table_name]
+def add_annotation_visible_foreign_keys(catalog, schema_name, table_name, value, model=None, apply=True):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables.get(table_name)
+    if table != None:
         visible_foreign_keys = table.annotations['tag:isrd.isi.edu,2016:visible-foreign-keys']['detailed']
         if value not in visible_foreign_keys:
             visible_foreign_keys.append(value)
-            print('Applying visible-foreign-keys annotation: {}'.format(value))
-            model.apply()
-            return
+            logger.info('Applying visible-foreign-keys annotation: {}'.format(value))
+            if apply == True:
+                table.apply()
+            return True
+    return False
     
-def drop_annotation_foreign_keys(catalog, schema_name, table_name, value):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables:
-        table = schema.tables[table_name]
+def drop_annotation_foreign_keys(catalog, schema_name, table_name, value, model=None, apply=True):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables.get(table_name)
+    if table != None:
         visible_foreign_keys = table.annotations['tag:isrd.isi.edu,2016:visible-foreign-keys']['detailed']
-        if value in visible_foreign_keys:
-            i = 0
-            for visible_foreign_key in visible_foreign_keys:
-                if visible_foreign_key == value:
-                    del visible_foreign_keys[i]
-                    model.apply()
-                    print('Dropping visible-foreign-keys annotation: {}'.format(value))
-                    return
-                else:
-                    i +=1
+        try:
+            visible_foreign_keys.remove(value)
+        except ValueError:
+            return False
+        if apply == True:
+            table.apply()
+        logger.info('Dropping visible-foreign-keys annotation: {}'.format(value))
+        return True
+    return False
     
-def add_annotation_visible_columns(catalog, schema_name, table_name, value):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables:
-        table = schema.tables[table_name]
+def add_annotation_visible_columns(catalog, schema_name, table_name, value, model=None, apply=True):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables.get(table_name)
+    if table != None:
         visible_columns = table.annotations['tag:isrd.isi.edu,2016:visible-columns']
         changed = False
-        if value not in visible_columns['detailed']:
-            visible_columns['detailed'].append(value)
-            changed = True
-        if value not in visible_columns['entry']:
-            visible_columns['entry'].append(value)
-            changed = True
+        for context in ['detailed', 'entry']:
+            context_columns = visible_columns[context]
+            if value not in context_columns:
+                context_columns.append(value)
+                changed = True
         if changed == True:
-            print('Applying visible-columns annotation: {}'.format(value))
-            model.apply()
+            logger.info('Applying visible-columns annotation: {}'.format(value))
+            if apply == True:
+                table.apply()
+        return changed
+    return False
     
-def drop_annotation_columns(catalog, schema_name, table_name, value):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables:
-        table = schema.tables[table_name]
+def drop_annotation_columns(catalog, schema_name, table_name, value, model=None, apply=True):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables.get(table_name)
+    if table != None:
         visible_columns = table.annotations['tag:isrd.isi.edu,2016:visible-columns']
         changed = False
-        if value in visible_columns['detailed']:
-            i = 0
-            for visible_column in visible_columns['detailed']:
-                if visible_column == value:
-                    del visible_columns['detailed'][i]
-                    changed = True
-                    break
-                else:
-                    i +=1
-        if value in visible_columns['entry']:
-            i = 0
-            for visible_column in visible_columns['entry']:
-                if visible_column == value:
-                    del visible_columns['entry'][i]
-                    changed = True
-                    break
-                else:
-                    i +=1
+        for context in ['detailed', 'entry']:
+            try:
+                visible_columns[context].remove(value)
+                changed = True
+            except ValueError:
+                pass
         if changed == True:
-            print('Dropping visible-columns annotation: {}'.format(value))
-            model.apply()
+            logger.info('Dropping visible-columns annotation: {}'.format(value))
+            if apply == True:
+                table.apply()
+        return changed
+    return False
     
-def drop_primary_key_if_exist(catalog, schema_name, table_name, unique_columns):
-    model = catalog.getCatalogModel()
+"""
+Names of the keys and FKs, following the ERMrest convention <table>_<columns>_key / <table>_<columns>_fkey.
+"""
+def key_name(table_name, columns):
+    return '{}_{}_key'.format(table_name, '_'.join(columns))
+
+def fkey_name(table_name, columns):
+    return '{}_{}_fkey'.format(table_name, '_'.join(columns))
+
+def drop_primary_key_if_exist(catalog, schema_name, table_name, unique_columns, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     table = schema.tables[table_name]
-    constraint_name = '{}_{}_key'.format(table_name, '_'.join(unique_columns))
-    try:
-        pk = table.keys.__getitem__((schema, constraint_name))
-    except:
-        pk = None
-    
+    constraint_name = key_name(table_name, unique_columns)
+    pk = table.keys.elements.get((schema, constraint_name))
     if pk != None:
         pk.drop()
 
-def drop_foreign_key_if_exist(catalog, schema_name, table_name, foreign_key_columns):
-    model = catalog.getCatalogModel()
+def drop_foreign_key_if_exist(catalog, schema_name, table_name, foreign_key_columns, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     table = schema.tables[table_name]
-    constraint_name = '{}_{}_fkey'.format(table_name, '_'.join(foreign_key_columns))
-    try:
-        fk = table.foreign_keys.__getitem__((schema, constraint_name))
-    except:
-        fk = None
-    
+    constraint_name = fkey_name(table_name, foreign_key_columns)
+    fk = table.foreign_keys.elements.get((schema, constraint_name))
     if fk != None:
-        print('Dropping Foreign Key: {} of table {}:{}'.format(constraint_name, schema_name, table_name))
+        logger.info('Dropping Foreign Key: {} of table {}:{}'.format(constraint_name, schema_name, table_name))
         fk.drop()
 
-def drop_column_if_exist(catalog, schema_name, table_name, column_name):
-    model = catalog.getCatalogModel()
+def drop_column_if_exist(catalog, schema_name, table_name, column_name, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     table = schema.tables[table_name]
-    if column_name in table.columns.elements:
-        column = table.column_definitions.__getitem__(column_name)
-        print('Dropping column: {} of table {}:{}'.format(column_name, schema_name, table_name))
+    column = table.columns.elements.get(column_name)
+    if column != None:
+        logger.info('Dropping column: {} of table {}:{}'.format(column_name, schema_name, table_name))
         column.drop()
 
-def drop_table_if_exist(catalog, schema_name, table_name):
-    model = catalog.getCatalogModel()
-    if schema_name not in model.schemas:
+def drop_table_if_exist(catalog, schema_name, table_name, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
+    schema = model.schemas.get(schema_name)
+    if schema == None:
         return
-    schema = model.schemas[schema_name]
-    if table_name in schema.tables.keys():
-        print('Dropping table {}:{}'.format(schema_name, table_name))
-        schema.tables[table_name].drop()
-
-def drop_schema_if_exist(catalog, schema_name):
-    model = catalog.getCatalogModel()
-    if schema_name in model.schemas:
-        schema = model.schemas[schema_name]
-        print('Dropping schema {}'.format(schema_name))
+    table = schema.tables.get(table_name)
+    if table != None:
+        logger.info('Dropping table {}:{}'.format(schema_name, table_name))
+        table.drop()
+
+def drop_schema_if_exist(catalog, schema_name, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
+    schema = model.schemas.get(schema_name)
+    if schema != None:
+        logger.info('Dropping schema {}'.format(schema_name))
         schema.drop()
 
 """
-Restore the database to the previous status.
+Size the connection pool of the catalog session for the concurrent vocabulary loads.
+The connections are kept alive and reused by all the ERMrest requests of the script;
+the retry policy configured by deriva is preserved.
+"""
+def tune_session(session, pool_size):
+    max_retries = session.get_adapter('https://').max_retries
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=max_retries))
+
+"""
+Run independent steps concurrently and wait for all of them.
+The steps are callables without arguments; the first error is re-raised.
+The steps must not change the shared catalog model, whose structures are not thread-safe.
+"""
+def run_concurrently(steps):
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        futures = [executor.submit(step) for step in steps]
+        for future in futures:
+            future.result()
+
 """
-def restore(catalog):
-    drop_annotation_foreign_keys(catalog, 'isa', 'imaging_data', ['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey'])
-    drop_annotation_columns(catalog, 'isa', 'imaging_data', ['isa', 'imaging_data_processing_status_fkey'])
-    drop_annotation_columns(catalog, 'isa', 'imaging_data', virtual_column)
-    add_annotation_source_definitions(catalog, 'isa', 'imaging_data', None)
+Tables dropped by restore(), in order.
+The tables are dropped one at a time; each table is dropped before the tables it references.
+"""
+restore_drop_tables = [
+    ('Imaging', 'Image_Annotation'),
+    ('Imaging', 'Processed_Image'),
+    ('Imaging', 'Image_Annotation_File'),
+    ('Imaging', 'Image_Channel'),
+    ('Imaging', 'Image_Z'),
+    ('Imaging', 'Image'),
+    ('vocab', 'color'),
+    ('vocab', 'display_method'),
+    ('vocab', 'processing_status')
+]
 
-    drop_foreign_key_if_exist(catalog, 'isa', 'imaging_data', ['processing_status'])
+"""
+Restore the database to the previous status.
+The FK on imaging_data is dropped before its column, and referencing tables
+are dropped before the tables they reference, so no drop has to cascade.
+"""
+def restore(catalog, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
+    changed = False
+    changed |= drop_annotation_foreign_keys(catalog, 'isa', 'imaging_data', ['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey'], model=model, apply=False)
+    changed |= drop_annotation_columns(catalog, 'isa', 'imaging_data', ['isa', 'imaging_data_processing_status_fkey'], model=model, apply=False)
+    changed |= drop_annotation_columns(catalog, 'isa', 'imaging_data', virtual_column, model=model, apply=False)
+    changed |= add_annotation_source_definitions(catalog, 'isa', 'imaging_data', None, model=model, apply=False)
+    if changed == True:
+        model.schemas['isa'].tables['imaging_data'].apply()
+
+    for foreign_key_columns, reference_schema, reference_table, referenced_columns in imaging_data_foreign_keys:
+        drop_foreign_key_if_exist(catalog, 'isa', 'imaging_data', foreign_key_columns, model=model)
     
-    drop_column_if_exist(catalog, 'isa', 'imaging_data', 'processing_status')
+    for column_name, column_type, default_value, nullok in imaging_data_columns:
+        drop_column_if_exist(catalog, 'isa', 'imaging_data', column_name, model=model)
     
-    drop_table_if_exist(catalog, 'Imaging', 'Image_Annotation')
-    drop_table_if_exist(catalog, 'Imaging', 'Image_Annotation_File')
-    drop_table_if_exist(catalog, 'Imaging', 'Processed_Image')
-    drop_table_if_exist(catalog, 'Imaging', 'Image_Channel')
-    drop_table_if_exist(catalog, 'Imaging', 'Image_Z')
-    drop_table_if_exist(catalog, 'Imaging', 'Image')
-
-    drop_table_if_exist(catalog, 'vocab', 'color')
-    drop_table_if_exist(catalog, 'vocab', 'display_method')
-    drop_table_if_exist(catalog, 'vocab', 'processing_status')
-    drop_schema_if_exist(catalog, 'Imaging')
-
-def create_vocabulary_table_if_not_exist(catalog, schema_name, table_name, comment):
-    model = catalog.getCatalogModel()
+    for schema_name, table_name in restore_drop_tables:
+        drop_table_if_exist(catalog, schema_name, table_name, model=model)
+    drop_schema_if_exist(catalog, 'Imaging', model=model)
+
+"""
+Vocabulary tables created in the vocab schema, with their comments.
+"""
+vocabulary_tables = [
+    ('processing_status', 'A set of status for processing an image.'),
+    ('display_method', 'Table containing controlled names for image display methods.'),
+    ('color', 'Colors and other terms used to describe slide channel appearance.')
+]
+
+def create_vocabulary_table_if_not_exist(catalog, schema_name, table_name, comment, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     if table_name not in schema.tables:
-        schema.create_table(Table.define_vocabulary(table_name, 'FACEBASE:{RID}', key_defs=[Key.define(['Name'], constraint_names=[ [schema_name, '{}_Name_key'.format(table_name)] ])], comment=comment))
+        schema.create_table(Table.define_vocabulary(table_name, 'FACEBASE:{RID}', key_defs=[Key.define(['Name'], constraint_names=[ [schema_name, key_name(table_name, ['Name'])] ])], comment=comment))
 
-def add_rows_to_vocab_processing_status(catalog):
+def add_rows_to_vocab_processing_status(catalog, pb=None):
 
     """
     {'Name': 'HATRAC GET ERROR', 'Description': 'An error occurred during a hatrac operation.'},
@@ -399,22 +449,24 @@ def add_rows_to_vocab_processing_status(catalog):
         {'Name': 'in progress', 'Description': 'The process was started.'},
         {'Name': 'error', 'Description': 'Generic error.'}
     ]
-    pb = catalog.getPathBuilder()
+    if pb == None:
+        pb = catalog.getPathBuilder()
     schema = pb.vocab
     processing_status = schema.processing_status
-    processing_status.insert(rows, defaults=['ID', 'URI'])
+    processing_status.insert(rows, defaults=['ID', 'URI'], on_conflict_skip=True)
 
-def add_rows_to_vocab_display_method(catalog):
+def add_rows_to_vocab_display_method(catalog, pb=None):
 
     rows =[
         {'Name': 'iiif', 'Description': 'International Image Interoperability Framework (iiif)'},
     ]
-    pb = catalog.getPathBuilder()
+    if pb == None:
+        pb = catalog.getPathBuilder()
     schema = pb.vocab
     display_method = schema.display_method
-    display_method.insert(rows, defaults=['ID', 'URI'])
+    display_method.insert(rows, defaults=['ID', 'URI'], on_conflict_skip=True)
 
-def add_rows_to_vocab_color(catalog):
+def add_rows_to_vocab_color(catalog, pb=None):
 
     rows =[
         {'Name': 'DAPI', 'Description': 'DAPI'},
@@ -425,1529 +477,1433 @@ def add_rows_to_vocab_color(catalog):
         {'Name': 'Magenta', 'Description': 'Magenta'},
         {'Name': 'White', 'Description': 'White'}
     ]
-    pb = catalog.getPathBuilder()
+    if pb == None:
+        pb = catalog.getPathBuilder()
     schema = pb.vocab
     color = schema.color
-    color.insert(rows, defaults=['ID', 'URI'])
-
-def create_processed_image_table_if_not_exists(catalog, schema_name):
-    annotations = {
-        "tag:isrd.isi.edu,2016:generated": None,
-        "tag:isrd.isi.edu,2016:table-display": {
-          "compact": {
-            "row_markdown_pattern": "[{{{RID}}}:{{{File_Name}}} ({{{File_Bytes}}} bytes)]({{{File_URL}}}){.download-alt}"
-          }
-        },
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "compact": [
-            "RID",
-            [
-              "Imaging",
-              "Processed_Image_Reference_Image_fkey"
-            ],
-            "File_URL",
-            "Z_Index",
-            "Display_Method",
-            "Channel_Number"
-          ],
-          "detailed": [
-            "RID",
-            [
-              "Imaging",
-              "Processed_Image_Reference_Image_fkey"
-            ],
-            "File_URL",
-            "Config",
-            "Z_Index",
-            "Display_Method",
-            "Channel_Number"
-          ]
-        }
+    color.insert(rows, defaults=['ID', 'URI'], on_conflict_skip=True)
+
+"""
+Load the vocabulary tables.
+Each table is loaded with a single multi-row POST; the tables are independent,
+so the POSTs are issued concurrently over one path builder.
+Rows whose Name already exists are skipped by ERMrest, so a table can be loaded again.
+"""
+def add_rows_to_vocab_tables(catalog):
+    pb = catalog.getPathBuilder()
+    run_concurrently([partial(loader, catalog, pb) for loader in [add_rows_to_vocab_processing_status, add_rows_to_vocab_display_method, add_rows_to_vocab_color]])
+
+"""
+Annotations shared by several columns and tables of the Imaging schema.
+"""
+generated_annotations = {
+    "tag:isrd.isi.edu,2016:generated": None
+}
+
+def asset_annotations(**asset):
+    return {
+        "tag:isrd.isi.edu,2017:asset": asset
+    }
+
+"""
+Asset annotations of a file stored in hatrac, whose MD5, name and size are
+kept in the <prefix>_MD5, <prefix>_Name and <prefix>_Bytes columns.
+"""
+def file_asset_annotations(prefix, url_pattern):
+    return asset_annotations(md5='{}_MD5'.format(prefix), url_pattern=url_pattern, filename_column='{}_Name'.format(prefix), byte_count_column='{}_Bytes'.format(prefix))
+
+processed_image_annotations = {
+    **generated_annotations,
+    "tag:isrd.isi.edu,2016:table-display": {
+      "compact": {
+        "row_markdown_pattern": "[{{{RID}}}:{{{File_Name}}} ({{{File_Bytes}}} bytes)]({{{File_URL}}}){.download-alt}"
       }
+    },
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "compact": [
+        "RID",
+        [
+          "Imaging",
+          "Processed_Image_Reference_Image_fkey"
+        ],
+        "File_URL",
+        "Z_Index",
+        "Display_Method",
+        "Channel_Number"
+      ],
+      "detailed": [
+        "RID",
+        [
+          "Imaging",
+          "Processed_Image_Reference_Image_fkey"
+        ],
+        "File_URL",
+        "Config",
+        "Z_Index",
+        "Display_Method",
+        "Channel_Number"
+      ]
+    }
+}
 
+@lru_cache(maxsize=None)
+def processed_image_table_def():
     table_name = 'Processed_Image'
     comment = 'Table for storing the metadata of the processed images.'
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Reference_Image',
-                builtin_types.text,
-                comment='The RID of the original image.',                        
-                nullok=False
-                ),
-            Column.define(
-                'Channel_Number',
-                builtin_types.int4,
-                comment='Color channel of this processed image.',
-                default=0,                      
-                nullok=False
-                ),
-            Column.define(
-                'File_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'File_URL',
-                builtin_types.text,
-                comment='The hatrac location.',
-                annotations={
-                    "tag:isrd.isi.edu,2017:asset": {
-                      "browser_upload": False,
-                      "filename_column": "File_Name"
-                    }
-                  },
-                nullok=True
-                ),
-            Column.define(
-                'File_Bytes',
-                builtin_types.int8,
-                nullok=True
-                ),
-            Column.define(
-                'File_MD5',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'id',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Config',
-                builtin_types.jsonb,
-                nullok=True
-                ),
-            Column.define(
-                'Z_Index',
-                builtin_types.int4,
-                nullok=True
-                ),
-            Column.define(
-                'Display_Method',
-                builtin_types.text,
-                nullok=True
-                )
-            ]
-
-        key_defs = [
-            Key.define(['Reference_Image', 'Channel_Number', 'Z_Index'],
-                       constraint_names=[['Imaging', 'Processed_Image_Reference_Image_Channel_Number_Z_Index_key']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Display_Method'], 'vocab', 'display_method', ['Name'],
-                              constraint_names=[['Imaging', 'Processed_Image_Display_Method_fkey']],
-                              on_update='CASCADE',
-                              on_delete='NO ACTION'   
+    column_defs = [
+        Column.define(
+            'Reference_Image',
+            builtin_types.text,
+            comment='The RID of the original image.',                        
+            nullok=False
+            ),
+        Column.define(
+            'Channel_Number',
+            builtin_types.int4,
+            comment='Color channel of this processed image.',
+            default=0,                      
+            nullok=False
+            ),
+        Column.define(
+            'File_Name',
+            builtin_types.text,
+            nullok=True
+            ),
+        Column.define(
+            'File_URL',
+            builtin_types.text,
+            comment='The hatrac location.',
+            annotations=asset_annotations(browser_upload=False, filename_column="File_Name"),
+            nullok=True
+            ),
+        Column.define(
+            'File_Bytes',
+            builtin_types.int8,
+            nullok=True
+            ),
+        Column.define(
+            'File_MD5',
+            builtin_types.text,
+            nullok=True
             ),
-            ForeignKey.define(['Reference_Image', 'Channel_Number'], 'Imaging', 'Image_Channel', ['Image', 'Channel_Number'],
-                              constraint_names=[['Imaging', 'Processed_Image_Reference_Image_Channel_Number_fkey']],
-                              on_update='CASCADE',
-                              on_delete='NO ACTION'
+        Column.define(
+            'id',
+            builtin_types.text,
+            nullok=True
             ),
-            ForeignKey.define(['Reference_Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Processed_Image_Reference_Image_fkey']],
-                              on_update='NO ACTION',
-                              on_delete='CASCADE'   
+        Column.define(
+            'Config',
+            builtin_types.jsonb,
+            nullok=True
+            ),
+        Column.define(
+            'Z_Index',
+            builtin_types.int4,
+            nullok=True
+            ),
+        Column.define(
+            'Display_Method',
+            builtin_types.text,
+            nullok=True
             )
         ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            comment=comment,
-            annotations=annotations,
-            acls=table_acls,
-            acl_bindings=processed_image_acl_bindings,
-            provide_system=True
+
+    key_defs = [
+        Key.define(['Reference_Image', 'Channel_Number', 'Z_Index'],
+                   constraint_names=[['Imaging', 'Processed_Image_Reference_Image_Channel_Number_Z_Index_key']]
         )
-        
-        schema.create_table(table_def)
-        
-def create_image_channel_table_if_not_exists(catalog, schema_name):
-    annotations = {
-        "tag:isrd.isi.edu,2016:table-display": {
-          "row_name": {
-            "template_engine": "handlebars",
-            "row_markdown_pattern": "{{{Channel_Number}}}{{#if Name}}:{{{Name}}}{{/if}}{{#if Notes}} ({{{Notes}}}){{/if}}"
-          }
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Display_Method'], 'vocab', 'display_method', ['Name'],
+                          constraint_names=[['Imaging', 'Processed_Image_Display_Method_fkey']],
+                          on_update='CASCADE',
+                          on_delete='NO ACTION'   
+        ),
+        ForeignKey.define(['Reference_Image', 'Channel_Number'], 'Imaging', 'Image_Channel', ['Image', 'Channel_Number'],
+                          constraint_names=[['Imaging', 'Processed_Image_Reference_Image_Channel_Number_fkey']],
+                          on_update='CASCADE',
+                          on_delete='NO ACTION'
+        ),
+        ForeignKey.define(['Reference_Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Processed_Image_Reference_Image_fkey']],
+                          on_update='NO ACTION',
+                          on_delete='CASCADE'   
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        comment=comment,
+        annotations=processed_image_annotations,
+        acls=table_acls,
+        acl_bindings=processed_image_acl_bindings,
+        provide_system=True
+    )
+
+image_channel_annotations = {
+    "tag:isrd.isi.edu,2016:table-display": {
+      "row_name": {
+        "template_engine": "handlebars",
+        "row_markdown_pattern": "{{{Channel_Number}}}{{#if Name}}:{{{Name}}}{{/if}}{{#if Notes}} ({{{Notes}}}){{/if}}"
+      }
+    },
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "*": [
+        {
+          "source": "RID"
         },
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "*": [
-            {
-              "source": "RID"
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    'Imaging',
-                    "Image_Channel_Image_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "markdown_name": "Image"
-            },
-            {
-              "source": "Channel_Number"
-            },
-            {
-              "source": "Name"
-            },
-            {
-              "source": "Color_Type"
-            },
+        {
+          "source": [
             {
-              "source": "Notes"
+              "outbound": [
+                'Imaging',
+                "Image_Channel_Image_fkey"
+              ]
             },
-            {
-              "source": "Config"
-            }
-          ]
+            "RID"
+          ],
+          "markdown_name": "Image"
+        },
+        {
+          "source": "Channel_Number"
+        },
+        {
+          "source": "Name"
+        },
+        {
+          "source": "Color_Type"
+        },
+        {
+          "source": "Notes"
+        },
+        {
+          "source": "Config"
         }
-      }
+      ]
+    }
+}
 
+@lru_cache(maxsize=None)
+def image_channel_table_def():
     table_name = 'Image_Channel'
     comment = 'Image Channel'
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Image',
-                builtin_types.text,
-                comment='The image associated with this channel.',                        
-                nullok=False
-                ),
-            Column.define(
-                'Channel_Number',
-                builtin_types.int4,
-                comment='Which channel (1,2, 3, ...).',
-                nullok=False
-                ),
-            Column.define(
-                'Legacy_Color',
-                builtin_types.text,
-                comment='Color type (e.g., "DAPI" or "Combo") or color (red, blue, etc.)',
-                nullok=True
-                ),
-            Column.define(
-                'Name',
-                builtin_types.text,
-                comment='Channel name (name of the gene/protein displayed on the channel)',
-                nullok=False
-                ),
-            Column.define(
-                'Image_URL',
-                builtin_types.text,
-                comment='Image URL for this channel (used only in certain image formats).',
-                nullok=True
-                ),
-            Column.define(
-                'Notes',
-                builtin_types.markdown,
-                nullok=True
-                ),
-            Column.define(
-                'Pseudo_Color',
-                builtin_types.color_rgb_hex,
-                nullok=True
-                ),
-            Column.define(
-                'Is_RGB',
-                builtin_types.boolean,
-                nullok=True
-                ),
-            Column.define(
-                'Config',
-                builtin_types.jsonb,
-                nullok=True
-                )
-            ]
-
-        key_defs = [
-            Key.define(['Image', 'Channel_Number'],
-                       constraint_names=[['Imaging', 'Image_Channel_Imagekey1']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Channel_Image_fkey']],
-                              on_update='CASCADE',
-                              on_delete='CASCADE'
+    column_defs = [
+        Column.define(
+            'Image',
+            builtin_types.text,
+            comment='The image associated with this channel.',                        
+            nullok=False
             ),
-            ForeignKey.define(['Legacy_Color'], 'vocab', 'color', ['Name'],
-                              constraint_names=[['Imaging', 'Image_Channel_Legacy_Color_fkey']],
-                              on_update='CASCADE',
-                              on_delete='NO ACTION'
+        Column.define(
+            'Channel_Number',
+            builtin_types.int4,
+            comment='Which channel (1,2, 3, ...).',
+            nullok=False
+            ),
+        Column.define(
+            'Legacy_Color',
+            builtin_types.text,
+            comment='Color type (e.g., "DAPI" or "Combo") or color (red, blue, etc.)',
+            nullok=True
+            ),
+        Column.define(
+            'Name',
+            builtin_types.text,
+            comment='Channel name (name of the gene/protein displayed on the channel)',
+            nullok=False
+            ),
+        Column.define(
+            'Image_URL',
+            builtin_types.text,
+            comment='Image URL for this channel (used only in certain image formats).',
+            nullok=True
+            ),
+        Column.define(
+            'Notes',
+            builtin_types.markdown,
+            nullok=True
+            ),
+        Column.define(
+            'Pseudo_Color',
+            builtin_types.color_rgb_hex,
+            nullok=True
+            ),
+        Column.define(
+            'Is_RGB',
+            builtin_types.boolean,
+            nullok=True
+            ),
+        Column.define(
+            'Config',
+            builtin_types.jsonb,
+            nullok=True
             )
         ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            comment=comment,
-            annotations=annotations,
-            acls=table_acls,
-            acl_bindings=image_channel_acl_bindings,
-            provide_system=True
+
+    key_defs = [
+        Key.define(['Image', 'Channel_Number'],
+                   constraint_names=[['Imaging', 'Image_Channel_Imagekey1']]
         )
-        
-        schema.create_table(table_def)
-        
-def create_image_z_table_if_not_exists(catalog, schema_name):
-    annotations = {
-        "tag:isrd.isi.edu,2016:generated": None,
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "*": [
-            "RID",
-            [
-              "Imaging",
-              "Image_Z_Image_fkey"
-            ],
-            "OME_Companion_URL",
-            "Z_Index"
-          ]
-       }
-    }
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Channel_Image_fkey']],
+                          on_update='CASCADE',
+                          on_delete='CASCADE'
+        ),
+        ForeignKey.define(['Legacy_Color'], 'vocab', 'color', ['Name'],
+                          constraint_names=[['Imaging', 'Image_Channel_Legacy_Color_fkey']],
+                          on_update='CASCADE',
+                          on_delete='NO ACTION'
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        comment=comment,
+        annotations=image_channel_annotations,
+        acls=table_acls,
+        acl_bindings=image_channel_acl_bindings,
+        provide_system=True
+    )
+
+image_z_annotations = {
+    **generated_annotations,
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "*": [
+        "RID",
+        [
+          "Imaging",
+          "Image_Z_Image_fkey"
+        ],
+        "OME_Companion_URL",
+        "Z_Index"
+      ]
+   }
+}
+
+@lru_cache(maxsize=None)
+def image_z_table_def():
     table_name = 'Image_Z'
     comment = 'Table containing metadata related to generated z of multi-channel images. This table is primarily used for exporting OME Tiff.'
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Image',
-                builtin_types.text,
-                comment='The RID of the original image.',                        
-                nullok=False
-                ),
-            Column.define(
-                'Z_Index',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'OME_Companion_URL',
-                builtin_types.text,
-                comment='File URL of OME-Tiff companion file associated with a specific z plane.',
-                annotations={
-                    "tag:isrd.isi.edu,2017:asset": {
-                      "browser_upload": False,
-                      "filename_column": "OME_Companion_Name"
-                    }
-                  },
-                nullok=False
-                ),
-            Column.define(
-                'OME_Companion_Name',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'OME_Companion_Bytes',
-                builtin_types.int8,
-                nullok=False
-                ),
-            Column.define(
-                'OME_Companion_MD5',
-                builtin_types.text,
-                nullok=False
-                )
-            ]
-
-        key_defs = [
-            Key.define(['Image', 'Z_Index'],
-                       constraint_names=[['Imaging', 'Image_Z_Image_Z_Index_key']]
+    column_defs = [
+        Column.define(
+            'Image',
+            builtin_types.text,
+            comment='The RID of the original image.',                        
+            nullok=False
             ),
-            Key.define(['OME_Companion_MD5'],
-                       constraint_names=[['Imaging', 'Image_Z_OME_Companion_MD5_key']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Z_Image_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'Z_Index',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'OME_Companion_URL',
+            builtin_types.text,
+            comment='File URL of OME-Tiff companion file associated with a specific z plane.',
+            annotations=asset_annotations(browser_upload=False, filename_column="OME_Companion_Name"),
+            nullok=False
+            ),
+        Column.define(
+            'OME_Companion_Name',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'OME_Companion_Bytes',
+            builtin_types.int8,
+            nullok=False
+            ),
+        Column.define(
+            'OME_Companion_MD5',
+            builtin_types.text,
+            nullok=False
             )
         ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            annotations=annotations,
-            comment=comment,
-            acls=table_acls,
-            acl_bindings=image_z_acl_bindings,
-            provide_system=True
+
+    key_defs = [
+        Key.define(['Image', 'Z_Index'],
+                   constraint_names=[['Imaging', 'Image_Z_Image_Z_Index_key']]
+        ),
+        Key.define(['OME_Companion_MD5'],
+                   constraint_names=[['Imaging', 'Image_Z_OME_Companion_MD5_key']]
         )
-        
-        schema.create_table(table_def)
-
-def create_image_annotation_file_table_if_not_exists(catalog, schema_name):
-    table_annotations = {
-        "tag:isrd.isi.edu,2016:table-display": {
-          "compact": {
-            "row_order": [
-              {
-                "column": "RMT",
-                "descending": True
-              }
-            ]
-          },
-          "row_name": {
-            "row_markdown_pattern": "[{{{RID}}}](/chaise/record/#{{{$catalog.snapshot}}}/Imaging:Image_Annotation_File/RID={{{RID}}}): {{{SVG_File_Name}}}"
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Z_Image_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        annotations=image_z_annotations,
+        comment=comment,
+        acls=table_acls,
+        acl_bindings=image_z_acl_bindings,
+        provide_system=True
+    )
+
+"""
+Handlebars pattern of the iframe previewing an overlay file over its (non OME) tiff image in the viewer.
+The patterns are rendered once, when the module is loaded.
+"""
+image_overlay_preview_pattern = (
+    "{{#if (regexMatch $fkeys.Imaging.%(fkey)s.values.Download_Tiff_URL \"\\.tif:\" ) }}"
+    "{{#unless (regexMatch $fkeys.Imaging.%(fkey)s.values.Download_Tiff_URL \"\\.ome\\.tif:\" ) }} %(title)s \n "
+    "::: iframe [{{Image}} (full screen)](/chaise/viewer/#1/Imaging:Image/%(image_key)s={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.%(fkey)s.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{%(overlay)s}}})"
+    "{width=1500 height=1500 link=/chaise/viewer/#1/Imaging:Image/id={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.%(fkey)s.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{%(overlay)s}}} resize=both } \n ::: {{/unless}}{{/if}}"
+)
+
+image_annotation_file_preview_pattern = image_overlay_preview_pattern % {
+    "fkey": "Image_Annotation_File_Image_fkey",
+    "title": "**Preview** of the SVG file over the chosen image (**read only**)",
+    "image_key": "RID",
+    "overlay": "SVG_File"
+}
+
+image_annotation_display_pattern = image_overlay_preview_pattern % {
+    "fkey": "Image_Annotation_Image_fkey",
+    "title": "**Annotation Display**",
+    "image_key": "id",
+    "overlay": "File_URL"
+}
+
+"""
+Visible column fragments shared by the contexts of the Image_Annotation_File table.
+"""
+image_annotation_file_image_source = {
+  "source": [
+    {
+      "outbound": [
+        "Imaging",
+        "Image_Annotation_File_Image_fkey"
+      ]
+    },
+    "RID"
+  ],
+  "markdown_name": "Image"
+}
+
+image_annotation_file_sources = [
+  {
+    "source": "SVG_File"
+  },
+  {
+    "source": "QuPath_Class_File"
+  },
+  {
+    "source": "Notes"
+  }
+]
+
+image_annotation_file_annotations = {
+    "tag:isrd.isi.edu,2016:table-display": {
+      "compact": {
+        "row_order": [
+          {
+            "column": "RMT",
+            "descending": True
           }
+        ]
+      },
+      "row_name": {
+        "row_markdown_pattern": "[{{{RID}}}](/chaise/record/#{{{$catalog.snapshot}}}/Imaging:Image_Annotation_File/RID={{{RID}}}): {{{SVG_File_Name}}}"
+      }
+    },
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "*": [{"source": "RID"}, image_annotation_file_image_source] + image_annotation_file_sources + [
+        {
+          "source": "Processing_Status"
+        },
+        {
+          "source": "Processing_Detail"
+        }
+      ],
+      "entry": [
+        {
+          "source": "RID"
         },
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "*": [
+        {
+          "source": [
             {
-              "source": "RID"
+              "outbound": [
+                "Imaging",
+                "Image_Annotation_File_Image_Z_Index_fkey"
+              ]
             },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_File_Image_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "markdown_name": "Image"
-            },
-            {
-              "source": "SVG_File"
-            },
-            {
-              "source": "QuPath_Class_File"
-            },
-            {
-              "source": "Notes"
-            },
-            {
-              "source": "Processing_Status"
-            },
-            {
-              "source": "Processing_Detail"
-            }
+            "RID"
           ],
-          "entry": [
-            {
-              "source": "RID"
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_File_Image_Z_Index_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "markdown_name": "Image"
-            },
-            {
-              "source": "SVG_File"
-            },
-            {
-              "source": "QuPath_Class_File"
-            },
-            {
-              "source": "Notes"
-            }
-          ],
-          "detailed": [
-            {
-              "source": "RID"
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_File_Image_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "markdown_name": "Image"
-            },
-            {
-              "source": "Z_Index"
-            },
-            {
-              "source": "SVG_File"
-            },
-            {
-              "source": "QuPath_Class_File"
-            },
-            {
-              "source": "Notes"
-            },
-            {
-              "source": "Processing_Status",
-              "display": "{{{Processing_Status}}}{{#if Processing_Detail}}{{{Processing_Detail}}}{{/if}}"
-            },
-            {
-              "source": "Release_Date"
-            },
-            {
-              "display": {
-                "template_engine": "handlebars",
-                "markdown_pattern": "{{#if (regexMatch $fkeys.Imaging.Image_Annotation_File_Image_fkey.values.Download_Tiff_URL \"\\.tif:\" ) }}{{#unless (regexMatch $fkeys.Imaging.Image_Annotation_File_Image_fkey.values.Download_Tiff_URL \"\\.ome\\.tif:\" ) }} **Preview** of the SVG file over the chosen image (**read only**) \n ::: iframe [{{Image}} (full screen)](/chaise/viewer/#1/Imaging:Image/RID={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.Image_Annotation_File_Image_fkey.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{SVG_File}}}){width=1500 height=1500 link=/chaise/viewer/#1/Imaging:Image/id={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.Image_Annotation_File_Image_fkey.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{SVG_File}}} resize=both } \n ::: {{/unless}}{{/if}}"
-              },
-              "markdown_name": "Preview"
-            }
-          ]
+          "markdown_name": "Image"
+        }
+      ] + image_annotation_file_sources,
+      "detailed": [{"source": "RID"}, image_annotation_file_image_source, {"source": "Z_Index"}] + image_annotation_file_sources + [
+        {
+          "source": "Processing_Status",
+          "display": "{{{Processing_Status}}}{{#if Processing_Detail}}{{{Processing_Detail}}}{{/if}}"
+        },
+        {
+          "source": "Release_Date"
         },
-        "tag:isrd.isi.edu,2016:visible-foreign-keys": {
-          "*": []
+        {
+          "display": {
+            "template_engine": "handlebars",
+            "markdown_pattern": image_annotation_file_preview_pattern
+          },
+          "markdown_name": "Preview"
         }
-      }
+      ]
+    },
+    "tag:isrd.isi.edu,2016:visible-foreign-keys": {
+      "*": []
+    }
+}
+
+@lru_cache(maxsize=None)
+def image_annotation_file_table_def():
     table_name = 'Image_Annotation_File'
     comment = 'Image annotation file (svg) consisting of multiple groups of overlays associated with different anatomical terms.'
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Image',
-                builtin_types.text,
-                comment='The RID of the original image.',                        
-                nullok=False
-                ),
-            Column.define(
-                'Z_Index',
-                builtin_types.int4,
-                nullok=True
-                ),
-            Column.define(
-                'Channels',
-                builtin_types['int4[]'],
-                nullok=True
-                ),
-            Column.define(
-                'SVG_File',
-                builtin_types.text,
-                comment='SVG overlay file',
-                annotations={"tag:isrd.isi.edu,2017:asset": {
-                      "md5": "SVG_File_MD5",
-                      "url_pattern": "/hatrac/facebase/data/fb3/svg",
-                      "filename_column": "SVG_File_Name",
-                      "byte_count_column": "SVG_File_Bytes"
-                    }
-                  },
-                nullok=False
-                ),
-            Column.define(
-                'SVG_File_Name',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'SVG_File_Bytes',
-                builtin_types.int8,
-                nullok=False
-                ),
-            Column.define(
-                'SVG_File_MD5',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'QuPath_Class_File',
-                builtin_types.text,
-                comment='QuPath class file ontaining the mapping of colors to class names (i.e. anatomical terms) to be used with the accompanying svg annotation file.',
-                annotations={
-                    "tag:isrd.isi.edu,2017:asset": {
-                      "md5": "QuPath_Class_File_MD5",
-                      "url_pattern": "/hatrac/facebase/data/fb3/qupath/{{{QuPath_Class_File_MD5}}}",
-                      "filename_column": "QuPath_Class_File_Name",
-                      "byte_count_column": "QuPath_Class_File_Bytes"
-                    }
-                  },
-                nullok=True
-                ),
-            Column.define(
-                'QuPath_Class_File_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'QuPath_Class_File_Bytes',
-                builtin_types.int8,
-                nullok=True
-                ),
-            Column.define(
-                'QuPath_Class_File_MD5',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Notes',
-                builtin_types.markdown,
-                nullok=True
-                ),
-            Column.define(
-                'Curation_Status',
-                builtin_types.text,
-                default='In Preparation',
-                nullok=True
-                ),
-            Column.define(
-                'Principal_Investigator',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Release_Date',
-                builtin_types.timestamptz,
-                annotations={"tag:isrd.isi.edu,2016:generated": None},
-                nullok=True
-                ),
-            Column.define(
-                'Processing_Status',
-                builtin_types.text,
-                annotations={"tag:isrd.isi.edu,2016:generated": None},
-                nullok=True
-                ),
-            Column.define(
-                'Processing_Detail',
-                builtin_types.markdown,
-                annotations={"tag:isrd.isi.edu,2016:generated": None},
-                nullok=True
-                )
-            ]
-
-        key_defs = [
-            Key.define(['SVG_File_MD5'],
-                       constraint_names=[['Imaging', 'Image_Annotation_File_SVG_File_MD5_key']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Curation_Status'], 'vocab', 'dataset_status', ['id'],
-                              constraint_names=[['Imaging', 'Image_Annotation_File_Curation_Status_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+    column_defs = [
+        Column.define(
+            'Image',
+            builtin_types.text,
+            comment='The RID of the original image.',                        
+            nullok=False
+            ),
+        Column.define(
+            'Z_Index',
+            builtin_types.int4,
+            nullok=True
+            ),
+        Column.define(
+            'Channels',
+            builtin_types['int4[]'],
+            nullok=True
+            ),
+        Column.define(
+            'SVG_File',
+            builtin_types.text,
+            comment='SVG overlay file',
+            annotations=file_asset_annotations("SVG_File", "/hatrac/facebase/data/fb3/svg"),
+            nullok=False
+            ),
+        Column.define(
+            'SVG_File_Name',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'SVG_File_Bytes',
+            builtin_types.int8,
+            nullok=False
+            ),
+        Column.define(
+            'SVG_File_MD5',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'QuPath_Class_File',
+            builtin_types.text,
+            comment='QuPath class file ontaining the mapping of colors to class names (i.e. anatomical terms) to be used with the accompanying svg annotation file.',
+            annotations=file_asset_annotations("QuPath_Class_File", "/hatrac/facebase/data/fb3/qupath/{{{QuPath_Class_File_MD5}}}"),
+            nullok=True
             ),
-            ForeignKey.define(['Image', 'Z_Index'], 'Imaging', 'Image', ['RID', 'Default_Z'],
-                              constraint_names=[['Imaging', 'Image_Annotation_File_Image_Z_Index_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'QuPath_Class_File_Name',
+            builtin_types.text,
+            nullok=True
             ),
-            ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Annotation_File_Image_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'QuPath_Class_File_Bytes',
+            builtin_types.int8,
+            nullok=True
             ),
-            ForeignKey.define(['Principal_Investigator'], 'isa', 'person', ['name'],
-                              constraint_names=[['Imaging', 'Image_Annotation_File_Principal_Investigator_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'QuPath_Class_File_MD5',
+            builtin_types.text,
+            nullok=True
+            ),
+        Column.define(
+            'Notes',
+            builtin_types.markdown,
+            nullok=True
+            ),
+        Column.define(
+            'Curation_Status',
+            builtin_types.text,
+            default='In Preparation',
+            nullok=True
+            ),
+        Column.define(
+            'Principal_Investigator',
+            builtin_types.text,
+            nullok=True
+            ),
+        Column.define(
+            'Release_Date',
+            builtin_types.timestamptz,
+            annotations=generated_annotations,
+            nullok=True
+            ),
+        Column.define(
+            'Processing_Status',
+            builtin_types.text,
+            annotations=generated_annotations,
+            nullok=True
+            ),
+        Column.define(
+            'Processing_Detail',
+            builtin_types.markdown,
+            annotations=generated_annotations,
+            nullok=True
             )
         ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            comment=comment,
-            annotations=table_annotations,
-            acls=table_acls,
-            acl_bindings=image_annotation_file_acl_bindings,
-            provide_system=True
+
+    key_defs = [
+        Key.define(['SVG_File_MD5'],
+                   constraint_names=[['Imaging', 'Image_Annotation_File_SVG_File_MD5_key']]
         )
-        
-        schema.create_table(table_def)
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Curation_Status'], 'vocab', 'dataset_status', ['id'],
+                          constraint_names=[['Imaging', 'Image_Annotation_File_Curation_Status_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Image', 'Z_Index'], 'Imaging', 'Image', ['RID', 'Default_Z'],
+                          constraint_names=[['Imaging', 'Image_Annotation_File_Image_Z_Index_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Annotation_File_Image_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Principal_Investigator'], 'isa', 'person', ['name'],
+                          constraint_names=[['Imaging', 'Image_Annotation_File_Principal_Investigator_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        comment=comment,
+        annotations=image_annotation_file_annotations,
+        acls=table_acls,
+        acl_bindings=image_annotation_file_acl_bindings,
+        provide_system=True
+    )
 
-def create_image_annotation_table_if_not_exists(catalog, schema_name):
-    table_annotations = {
-        "tag:isrd.isi.edu,2016:table-display": {
-          "compact": {
-            "template_engine": "handlebars",
-            "separator_markdown": "\n",
-            "row_markdown_pattern": "- {{{RID}}}: [{{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.ID}}}:{{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.Name}}}](/chaise/record/#{{{$catalog.snapshot}}}/Vocabulary:Anatomy/RID={{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.RID}}})"
-          }
+"""
+Visible column fragments shared by the contexts of the Image_Annotation table.
+"""
+image_annotation_sources = [
+  {
+    "source": [
+      {
+        "outbound": [
+          "Imaging",
+          "Image_Annotation_Image_fkey"
+        ]
+      },
+      "RID"
+    ]
+  },
+  {
+    "source": [
+      {
+        "outbound": [
+          "Imaging",
+          "Image_Annotation_Anatomy_fkey"
+        ]
+      },
+      "RID"
+    ]
+  },
+  {
+    "source": "File_URL"
+  },
+  {
+    "source": "Comments"
+  }
+]
+
+image_annotation_annotations = {
+    "tag:isrd.isi.edu,2016:table-display": {
+      "compact": {
+        "template_engine": "handlebars",
+        "separator_markdown": "\n",
+        "row_markdown_pattern": "- {{{RID}}}: [{{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.ID}}}:{{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.Name}}}](/chaise/record/#{{{$catalog.snapshot}}}/Vocabulary:Anatomy/RID={{{$fkeys.Imaging.Image_Annotation_Anatomy_fkey.values.RID}}})"
+      }
+    },
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "*": list(image_annotation_sources),
+      "entry": list(image_annotation_sources),
+      "detailed": image_annotation_sources + [
+        {
+          "source": "Z_Index"
         },
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "*": [
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Image_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Anatomy_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": "File_URL"
-            },
-            {
-              "source": "Comments"
-            }
-          ],
-          "entry": [
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Image_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Anatomy_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": "File_URL"
-            },
-            {
-              "source": "Comments"
-            }
-          ],
-          "detailed": [
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Image_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Anatomy_fkey"
-                  ]
-                },
-                "RID"
-              ]
-            },
-            {
-              "source": "File_URL"
-            },
-            {
-              "source": "Comments"
-            },
-            {
-              "source": "Z_Index"
-            },
-            {
-              "display": {
-                "template_engine": "handlebars",
-                "markdown_pattern": "{{#if (regexMatch $fkeys.Imaging.Image_Annotation_Image_fkey.values.Download_Tiff_URL \"\\.tif:\" ) }}{{#unless (regexMatch $fkeys.Imaging.Image_Annotation_Image_fkey.values.Download_Tiff_URL \"\\.ome\\.tif:\" ) }} **Annotation Display** \n ::: iframe [{{Image}} (full screen)](/chaise/viewer/#1/Imaging:Image/id={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.Image_Annotation_Image_fkey.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{File_URL}}}){width=1500 height=1500 link=/chaise/viewer/#1/Imaging:Image/id={{{Image}}}?url=/iiif/2/{{#encode 'https://www.gudmap.org'}}{{/encode}}{{#encode $fkeys.Imaging.Image_Annotation_Image_fkey.values.Download_Tiff_URL}}{{/encode}}/info.json&url={{{File_URL}}} resize=both } \n ::: {{/unless}}{{/if}}"
-              },
-              "markdown_name": "Display"
-            }
-          ]
+        {
+          "display": {
+            "template_engine": "handlebars",
+            "markdown_pattern": image_annotation_display_pattern
+          },
+          "markdown_name": "Display"
         }
-      }
+      ]
+    }
+}
+
+@lru_cache(maxsize=None)
+def image_annotation_table_def():
     table_name = 'Image_Annotation'
     comment = 'Anatomical annotations associated with an image.'
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Image',
-                builtin_types.text,
-                comment='The RID of the original image.',                        
-                nullok=False
-                ),
-            Column.define(
-                'Anatomy',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'File_URL',
-                builtin_types.text,
-                comment='File URL of associated annotated overlays.',
-                annotations={
-                    "tag:isrd.isi.edu,2017:asset": {
-                      "md5": "File_MD5",
-                      "url_pattern": "/hatrac/facebase/data/fb3/annotations/{{$moment.year}}/{{{File_MD5}}}",
-                      "filename_column": "File_Name",
-                      "byte_count_column": "File_Bytes"
-                    }
-                  },
-                nullok=False
-                ),
-            Column.define(
-                'File_Name',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'File_Bytes',
-                builtin_types.int8,
-                nullok=False
-                ),
-            Column.define(
-                'File_MD5',
-                builtin_types.text,
-                nullok=False
-                ),
-            Column.define(
-                'Comments',
-                builtin_types.markdown,
-                nullok=True
-                ),
-            Column.define(
-                'Z_Index',
-                builtin_types.int4,
-                nullok=True
-                ),
-            Column.define(
-                'Channels',
-                builtin_types['int4[]'],
-                nullok=True
-                ),
-            Column.define(
-                'Image_Annotation_File',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Curation_Status',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Principal_Investigator',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Release_Date',
-                builtin_types.timestamptz,
-                annotations={
-                    "tag:isrd.isi.edu,2016:generated": None
-                  },
-                nullok=True
-                )
-            ]
-
-        key_defs = [
-            Key.define(['Image', 'Anatomy', 'Z_Index'],
-                       constraint_names=[['Imaging', 'Image_Annotation_Image_Anatomy_Z_Index_key']]
+    column_defs = [
+        Column.define(
+            'Image',
+            builtin_types.text,
+            comment='The RID of the original image.',                        
+            nullok=False
             ),
-            Key.define(['Image', 'Anatomy'],
-                       constraint_names=[['Imaging', 'Image_Annotation_Image_Anatomy_key']]
+        Column.define(
+            'Anatomy',
+            builtin_types.text,
+            nullok=False
             ),
-            Key.define(['File_MD5'],
-                       constraint_names=[['Imaging', 'Image_Annotation_File_MD5_key']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Anatomy'], 'vocab', 'anatomy', ['id'],
-                              constraint_names=[['Imaging', 'Image_Annotation_Anatomy_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'File_URL',
+            builtin_types.text,
+            comment='File URL of associated annotated overlays.',
+            annotations=file_asset_annotations("File", "/hatrac/facebase/data/fb3/annotations/{{$moment.year}}/{{{File_MD5}}}"),
+            nullok=False
+            ),
+        Column.define(
+            'File_Name',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'File_Bytes',
+            builtin_types.int8,
+            nullok=False
+            ),
+        Column.define(
+            'File_MD5',
+            builtin_types.text,
+            nullok=False
+            ),
+        Column.define(
+            'Comments',
+            builtin_types.markdown,
+            nullok=True
+            ),
+        Column.define(
+            'Z_Index',
+            builtin_types.int4,
+            nullok=True
             ),
-            ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Annotation_Image_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'Channels',
+            builtin_types['int4[]'],
+            nullok=True
             ),
-            ForeignKey.define(['Image_Annotation_File'], 'Imaging', 'Image_Annotation_File', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Annotation_Image_Annotation_File_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'Image_Annotation_File',
+            builtin_types.text,
+            nullok=True
             ),
-            ForeignKey.define(['Curation_Status'], 'vocab', 'dataset_status', ['id'],
-                              constraint_names=[['Imaging', 'Image_Annotation_Curation_Status_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'Curation_Status',
+            builtin_types.text,
+            nullok=True
             ),
-            ForeignKey.define(['Principal_Investigator'], 'isa', 'person', ['name'],
-                              constraint_names=[['Imaging', 'Image_Annotation_Principal_Investigator_fkey']],
-                              on_update='CASCADE',
-                              on_delete='SET NULL'   
+        Column.define(
+            'Principal_Investigator',
+            builtin_types.text,
+            nullok=True
+            ),
+        Column.define(
+            'Release_Date',
+            builtin_types.timestamptz,
+            annotations=generated_annotations,
+            nullok=True
             )
         ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            comment=comment,
-            annotations=table_annotations,
-            acls=table_acls,
-            acl_bindings=image_annotation_acl_bindings,
-            provide_system=True
-        )
-        
-        schema.create_table(table_def)
 
-def create_primary_key_if_not_exist(catalog, schema_name, table_name, unique_columns):
-    model = catalog.getCatalogModel()
+    key_defs = [
+        Key.define(['Image', 'Anatomy', 'Z_Index'],
+                   constraint_names=[['Imaging', 'Image_Annotation_Image_Anatomy_Z_Index_key']]
+        ),
+        Key.define(['Image', 'Anatomy'],
+                   constraint_names=[['Imaging', 'Image_Annotation_Image_Anatomy_key']]
+        ),
+        Key.define(['File_MD5'],
+                   constraint_names=[['Imaging', 'Image_Annotation_File_MD5_key']]
+        )
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Anatomy'], 'vocab', 'anatomy', ['id'],
+                          constraint_names=[['Imaging', 'Image_Annotation_Anatomy_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Annotation_Image_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Image_Annotation_File'], 'Imaging', 'Image_Annotation_File', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Annotation_Image_Annotation_File_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Curation_Status'], 'vocab', 'dataset_status', ['id'],
+                          constraint_names=[['Imaging', 'Image_Annotation_Curation_Status_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        ),
+        ForeignKey.define(['Principal_Investigator'], 'isa', 'person', ['name'],
+                          constraint_names=[['Imaging', 'Image_Annotation_Principal_Investigator_fkey']],
+                          on_update='CASCADE',
+                          on_delete='SET NULL'   
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        comment=comment,
+        annotations=image_annotation_annotations,
+        acls=table_acls,
+        acl_bindings=image_annotation_acl_bindings,
+        provide_system=True
+    )
+
+def create_primary_key_if_not_exist(catalog, schema_name, table_name, unique_columns, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     table = schema.tables[table_name]
-    constraint_name = '{}_{}_key'.format(table_name, '_'.join(unique_columns))
-    try:
-        pk = table.keys.__getitem__((schema, constraint_name))
-    except:
-        pk = None
-    
-    if pk == None:
+    constraint_name = key_name(table_name, unique_columns)
+    if (schema, constraint_name) not in table.keys.elements:
         pkey_def = Key.define(unique_columns, constraint_names=[ [schema_name, constraint_name] ])
         table.create_key(pkey_def)
 
-def create_foreign_key_if_not_exist(catalog, schema_name, table_name, foreign_key_columns, reference_schema, reference_table, referenced_columns, on_update='CASCADE', on_delete='SET NULL'):
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    table = schema.tables[table_name]
-    constraint_name = '{}_{}_fkey'.format(table_name, '_'.join(foreign_key_columns))
-    try:
-        fk = table.foreign_keys.__getitem__((schema, constraint_name))
-    except:
-        fk = None
-    
-    if fk == None:
-        fkey_def = ForeignKey.define(foreign_key_columns, reference_schema, reference_table, referenced_columns, 
-                                     on_update=on_update,
-                                     on_delete=on_delete,
-                                     constraint_names=[ [schema_name, constraint_name] ])
+def create_foreign_key_if_not_exist(catalog, schema_name, table_name, foreign_key_columns, reference_schema, reference_table, referenced_columns, on_update='CASCADE', on_delete='SET NULL', model=None):
+    create_foreign_keys_if_not_exist(catalog, schema_name, table_name, [(foreign_key_columns, reference_schema, reference_table, referenced_columns)], on_update=on_update, on_delete=on_delete, model=model)
+
+"""
+Create the missing FKs of a table.
+The FKs are given as (foreign_key_columns, reference_schema, reference_table, referenced_columns) tuples;
+the existing constraint names of the table are collected once and only the missing FKs are sent to the server.
+"""
+def create_foreign_keys_if_not_exist(catalog, schema_name, table_name, foreign_keys, on_update='CASCADE', on_delete='SET NULL', model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
+    table = model.schemas[schema_name].tables[table_name]
+    existing_fkeys = set(fk.constraint_name for fk in table.foreign_keys)
+    fkey_defs = []
+    for foreign_key_columns, reference_schema, reference_table, referenced_columns in foreign_keys:
+        constraint_name = fkey_name(table_name, foreign_key_columns)
+        if constraint_name not in existing_fkeys:
+            fkey_defs.append(ForeignKey.define(foreign_key_columns, reference_schema, reference_table, referenced_columns,
+                                               on_update=on_update,
+                                               on_delete=on_delete,
+                                               constraint_names=[ [schema_name, constraint_name] ]))
+    for fkey_def in fkey_defs:
         table.create_fkey(fkey_def)
+    return len(fkey_defs)
 
-def add_column_if_not_exist(catalog, schema_name, table_name, column_name, column_type, default_value, nullok):
-    model = catalog.getCatalogModel()
+def add_column_if_not_exist(catalog, schema_name, table_name, column_name, column_type, default_value, nullok, model=None):
+    add_columns_if_not_exist(catalog, schema_name, table_name, [(column_name, column_type, default_value, nullok)], model=model)
+
+"""
+Add the missing columns of a table.
+The columns are given as (column_name, column_type, default_value, nullok) tuples;
+the table is looked up once and only the missing columns are sent to the server.
+"""
+def add_columns_if_not_exist(catalog, schema_name, table_name, columns, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
     schema = model.schemas[schema_name]
     table = schema.tables[table_name]
-    if column_name not in table.columns.elements:
-        table.create_column(Column.define(column_name, builtin_types[column_type], default=default_value, nullok=nullok))
-
-def create_image_table_if_not_exists(catalog, schema_name):
-    thumbnail_annotations = {
-        "tag:misd.isi.edu,2015:display": {
-          "name": "Thumbnail"
-        },
-        "tag:isrd.isi.edu,2016:column-display": {
-          "*": {
-            "template_engine": "handlebars",
-            "markdown_pattern": "{{#if Thumbnail_URL}}[![Thumbnail]({{{Thumbnail_URL}}}){height=75}]({{{Thumbnail_URL}}}){{/if}}"
-          },
-          "name": "Thumbnail (click to view)",
-          "detailed": {
-            "template_engine": "handlebars",
-            "markdown_pattern": "{{#if Thumbnail_URL}}[![Thumbnail]({{{Thumbnail_URL}}}){height=75}]({{{Thumbnail_URL}}}){{/if}}"
-          }
-        }
+    existing_columns = table.columns.elements
+    column_defs = [Column.define(column_name, builtin_types[column_type], default=default_value, nullok=nullok)
+                   for column_name, column_type, default_value, nullok in columns
+                   if column_name not in existing_columns]
+    for column_def in column_defs:
+        table.create_column(column_def)
+    return len(column_defs)
+
+image_thumbnail_annotations = {
+    "tag:misd.isi.edu,2015:display": {
+      "name": "Thumbnail"
+    },
+    "tag:isrd.isi.edu,2016:column-display": {
+      "*": {
+        "template_engine": "handlebars",
+        "markdown_pattern": "{{#if Thumbnail_URL}}[![Thumbnail]({{{Thumbnail_URL}}}){height=75}]({{{Thumbnail_URL}}}){{/if}}"
+      },
+      "name": "Thumbnail (click to view)",
+      "detailed": {
+        "template_engine": "handlebars",
+        "markdown_pattern": "{{#if Thumbnail_URL}}[![Thumbnail]({{{Thumbnail_URL}}}){height=75}]({{{Thumbnail_URL}}}){{/if}}"
       }
+    }
+  }
 
-    table_annotations = {
-          "tag:isrd.isi.edu,2019:export": {
-            "detailed": {
-              "templates": [
+"""
+Path to the images extracted from an image, shared by the Derived_Images and Num_Derived_Images sources.
+"""
+derived_images_path = [
+    {
+      "inbound": [
+        "Imaging",
+        "Image_Parent_Image_Image_RID_fkey"
+      ]
+    },
+    "RID"
+]
+
+image_annotations = {
+      "tag:isrd.isi.edu,2019:export": {
+        "detailed": {
+          "templates": [
+            {
+              "type": "BAG",
+              "outputs": [
                 {
-                  "type": "BAG",
-                  "outputs": [
-                    {
-                      "source": {
-                        "api": "attribute",
-                        "path": "(RID)=(Imaging:Processed_Image:Reference_Image)/url:=File_URL,length:=File_Bytes,filename:=File_Name,md5:=File_MD5,Reference_Image"
-                      },
-                      "destination": {
-                        "name": "Files/QuPath/{Reference_Image}",
-                        "type": "fetch"
-                      }
-                    },
-                    {
-                      "source": {
-                        "api": "attribute",
-                        "path": "(RID)=(Imaging:Image_Z:Image)/url:=OME_Companion_URL,length:=OME_Companion_Bytes,filename:=OME_Companion_Name,md5:=OME_Companion_MD5,Image"
-                      },
-                      "destination": {
-                        "name": "Files/QuPath/{Image}",
-                        "type": "fetch"
-                      }
-                    },
-                    {
-                      "source": {
-                        "api": "attribute",
-                        "path": "(RID)=(Imaging:Image:Parent_Image)/(RID)=(Imaging:Processed_Image:Reference_Image)/url:=File_URL,length:=File_Bytes,filename:=File_Name,md5:=File_MD5,Reference_Image"
-                      },
-                      "destination": {
-                        "name": "Files/QuPath/{Reference_Image}",
-                        "type": "fetch"
-                      }
-                    },
-                    {
-                      "source": {
-                        "api": "attribute",
-                        "path": "(RID)=(Imaging:Image:Parent_Image)/(RID)=(Imaging:Image_Z:Image)/url:=OME_Companion_URL,length:=OME_Companion_Bytes,filename:=OME_Companion_Name,md5:=OME_Companion_MD5,Image"
-                      },
-                      "destination": {
-                        "name": "Files/QuPath/{Image}",
-                        "type": "fetch"
-                      }
-                    }
-                  ],
-                  "displayname": "BDBAG (all files)"
-                }
-              ]
-            }
-          },
-        "tag:misd.isi.edu,2015:display": {
-          "name": "Visualization Image"
-        },
-        "tag:isrd.isi.edu,2016:table-display": {
-          "row_name": {
-            "template_engine": "handlebars",
-            "row_markdown_pattern": "{{{RID}}}: {{{Original_File_Name}}}"
-          },
-          "row_name/compact": {
-            "template_engine": "handlebars",
-            "row_markdown_pattern": "[:span: :/span:{.pseudo-column-rowname-thumbnail-title}![]({{#if Thumbnail_URL}}{{{Thumbnail_URL}}}{{/if}}){height=75}](/chaise/record/#{{{$catalog.snapshot}}}/Imaging:Image/RID={{{RID}}}){.pseudo-column-rowname-thumbnail-link}"
-          }
-        },
-        "tag:isrd.isi.edu,2016:visible-columns": {
-          "entry": [
-            "RID",
-            "Notes"
-          ],
-          "filter": {
-            "and": [
-              {
-                "open": True,
-                "source": [
-                  {
-                    "inbound": [
-                      "Imaging",
-                      "Image_Annotation_Image_fkey"
-                    ]
+                  "source": {
+                    "api": "attribute",
+                    "path": "(RID)=(Imaging:Processed_Image:Reference_Image)/url:=File_URL,length:=File_Bytes,filename:=File_Name,md5:=File_MD5,Reference_Image"
                   },
-                  {
-                    "outbound": [
-                      "Imaging",
-                      "Image_Annotation_Anatomy_fkey"
-                    ]
+                  "destination": {
+                    "name": "Files/QuPath/{Reference_Image}",
+                    "type": "fetch"
+                  }
+                },
+                {
+                  "source": {
+                    "api": "attribute",
+                    "path": "(RID)=(Imaging:Image_Z:Image)/url:=OME_Companion_URL,length:=OME_Companion_Bytes,filename:=OME_Companion_Name,md5:=OME_Companion_MD5,Image"
                   },
-                  "RID"
-                ],
-                "markdown_name": "Annotated Anatomy"
-              }
-            ]
-          },
-          "compact": [
-            "RID",
-            {
-              "source": "Pixels_Per_Meter"
-            },
-            {
-              "sourcekey": "Annotated"
-            },
-            {
-              "sourcekey": "Updated_Notes"
-            }
-          ],
-          "detailed": [
-            "RID",
-            {
-              "source": [
+                  "destination": {
+                    "name": "Files/QuPath/{Image}",
+                    "type": "fetch"
+                  }
+                },
                 {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Primary_Table_imaging_data_RID_fkey"
-                  ]
+                  "source": {
+                    "api": "attribute",
+                    "path": "(RID)=(Imaging:Image:Parent_Image)/(RID)=(Imaging:Processed_Image:Reference_Image)/url:=File_URL,length:=File_Bytes,filename:=File_Name,md5:=File_MD5,Reference_Image"
+                  },
+                  "destination": {
+                    "name": "Files/QuPath/{Reference_Image}",
+                    "type": "fetch"
+                  }
                 },
-                "RID"
+                {
+                  "source": {
+                    "api": "attribute",
+                    "path": "(RID)=(Imaging:Image:Parent_Image)/(RID)=(Imaging:Image_Z:Image)/url:=OME_Companion_URL,length:=OME_Companion_Bytes,filename:=OME_Companion_Name,md5:=OME_Companion_MD5,Image"
+                  },
+                  "destination": {
+                    "name": "Files/QuPath/{Image}",
+                    "type": "fetch"
+                  }
+                }
               ],
-              "comment": "A reference to the primary image.",
-              "markdown_name": "Primary Image"
-            },
-            {
-              "source": "Pixels_Per_Meter"
-            },
-            {
-              "source": "Notes"
-            },
-            {
-              "source": "Thumbnail_URL"
-            },
-            {
-              "source": "Default_Z",
-              "markdown_name": "Displayed Z Index"
-            },
-            [
-              "Imaging",
-              "Image_Channel_Image_fkey"
+              "displayname": "BDBAG (all files)"
+            }
+          ]
+        }
+      },
+    "tag:misd.isi.edu,2015:display": {
+      "name": "Visualization Image"
+    },
+    "tag:isrd.isi.edu,2016:table-display": {
+      "row_name": {
+        "template_engine": "handlebars",
+        "row_markdown_pattern": "{{{RID}}}: {{{Original_File_Name}}}"
+      },
+      "row_name/compact": {
+        "template_engine": "handlebars",
+        "row_markdown_pattern": "[:span: :/span:{.pseudo-column-rowname-thumbnail-title}![]({{#if Thumbnail_URL}}{{{Thumbnail_URL}}}{{/if}}){height=75}](/chaise/record/#{{{$catalog.snapshot}}}/Imaging:Image/RID={{{RID}}}){.pseudo-column-rowname-thumbnail-link}"
+      }
+    },
+    "tag:isrd.isi.edu,2016:visible-columns": {
+      "entry": [
+        "RID",
+        "Notes"
+      ],
+      "filter": {
+        "and": [
+          {
+            "open": True,
+            "source": [
+              {
+                "inbound": [
+                  "Imaging",
+                  "Image_Annotation_Image_fkey"
+                ]
+              },
+              {
+                "outbound": [
+                  "Imaging",
+                  "Image_Annotation_Anatomy_fkey"
+                ]
+              },
+              "RID"
             ],
+            "markdown_name": "Annotated Anatomy"
+          }
+        ]
+      },
+      "compact": [
+        "RID",
+        {
+          "source": "Pixels_Per_Meter"
+        },
+        {
+          "sourcekey": "Annotated"
+        },
+        {
+          "sourcekey": "Updated_Notes"
+        }
+      ],
+      "detailed": [
+        "RID",
+        {
+          "source": [
             {
-              "sourcekey": "Parent_Image_Row"
+              "outbound": [
+                "Imaging",
+                "Image_Primary_Table_imaging_data_RID_fkey"
+              ]
             },
+            "RID"
+          ],
+          "comment": "A reference to the primary image.",
+          "markdown_name": "Primary Image"
+        },
+        {
+          "source": "Pixels_Per_Meter"
+        },
+        {
+          "source": "Notes"
+        },
+        {
+          "source": "Thumbnail_URL"
+        },
+        {
+          "source": "Default_Z",
+          "markdown_name": "Displayed Z Index"
+        },
+        [
+          "Imaging",
+          "Image_Channel_Image_fkey"
+        ],
+        {
+          "sourcekey": "Parent_Image_Row"
+        },
+        {
+          "sourcekey": "Derived_Images"
+        },
+        {
+          "source": [
             {
-              "sourcekey": "Derived_Images"
+              "inbound": [
+                "Imaging",
+                "Image_Annotation_Image_fkey"
+              ]
             },
             {
-              "source": [
-                {
-                  "inbound": [
-                    "Imaging",
-                    "Image_Annotation_Image_fkey"
-                  ]
-                },
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Annotation_Principal_Investigator_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "comment": "PIs associated with annotations created for this image",
-              "display": {
-                "show_foreign_key_link": True
-              },
-              "aggregate": "array_d",
-              "array_display": "csv",
-              "markdown_name": "Image Annotators"
+              "outbound": [
+                "Imaging",
+                "Image_Annotation_Principal_Investigator_fkey"
+              ]
             },
-            {
-              "markdown_name": "uri",
-              "hide_column_header": True,
-              "display": {
-                    "template_engine": "handlebars",
-                    "markdown_pattern": "{{#if Generated_Zs}}::: iframe [](/chaise/viewer/#{{{$catalog.snapshot}}}/Imaging:Image/RID={{RID}}?waterMark=FaceBase{{#if _Pixels_Per_Meter}}&meterScaleInPixels={{_Pixels_Per_Meter}}{{/if}}){style=\"min-width:1000px; min-height:700px; height:80vh;\" class=chaise-autofill  } \n {{/if}}"
-              }
-            }
-          ]
+            "RID"
+          ],
+          "comment": "PIs associated with annotations created for this image",
+          "display": {
+            "show_foreign_key_link": True
+          },
+          "aggregate": "array_d",
+          "array_display": "csv",
+          "markdown_name": "Image Annotators"
         },
-        "tag:isrd.isi.edu,2019:source-definitions": {
-          "fkeys": True,
-          "columns": True,
-          "sources": {
-            "Annotated": {
-              "source": [
-                {
-                  "inbound": [
-                    "Imaging",
-                    "Image_Annotation_Image_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "comment": "Indicate whether the image has any annotations",
-              "display": {
+        {
+          "markdown_name": "uri",
+          "hide_column_header": True,
+          "display": {
                 "template_engine": "handlebars",
-                "markdown_pattern": "{{#if (gt $_self 0)}}Yes{{/if}}"
-              },
-              "aggregate": "cnt",
-              "markdown_name": "Annotated"
+                "markdown_pattern": "{{#if Generated_Zs}}::: iframe [](/chaise/viewer/#{{{$catalog.snapshot}}}/Imaging:Image/RID={{RID}}?waterMark=FaceBase{{#if _Pixels_Per_Meter}}&meterScaleInPixels={{_Pixels_Per_Meter}}{{/if}}){style=\"min-width:1000px; min-height:700px; height:80vh;\" class=chaise-autofill  } \n {{/if}}"
+          }
+        }
+      ]
+    },
+    "tag:isrd.isi.edu,2019:source-definitions": {
+      "fkeys": True,
+      "columns": True,
+      "sources": {
+        "Annotated": {
+          "source": [
+            {
+              "inbound": [
+                "Imaging",
+                "Image_Annotation_Image_fkey"
+              ]
             },
-            "Original_File": {
-              "source": "Original_File_Name",
-              "display": {
-                "wait_for": [
-                  "Num_Derived_Images"
-                ],
-                "template_engine": "handlebars",
-                "markdown_pattern": "{{#if Parent_Image}}{{{Parent_Image_Row.values.Original_File_Name}}} (extracted image {{{Series}}}){{else if (gt Num_Derived_Images 0)}}{{{Original_File_Name}}} (image set of {{{Num_Derived_Images}}}){{else}}{{{Original_File_Name}}}{{/if}}"
+            "RID"
+          ],
+          "comment": "Indicate whether the image has any annotations",
+          "display": {
+            "template_engine": "handlebars",
+            "markdown_pattern": "{{#if (gt $_self 0)}}Yes{{/if}}"
+          },
+          "aggregate": "cnt",
+          "markdown_name": "Annotated"
+        },
+        "Original_File": {
+          "source": "Original_File_Name",
+          "display": {
+            "wait_for": [
+              "Num_Derived_Images"
+            ],
+            "template_engine": "handlebars",
+            "markdown_pattern": "{{#if Parent_Image}}{{{Parent_Image_Row.values.Original_File_Name}}} (extracted image {{{Series}}}){{else if (gt Num_Derived_Images 0)}}{{{Original_File_Name}}} (image set of {{{Num_Derived_Images}}}){{else}}{{{Original_File_Name}}}{{/if}}"
+          }
+        },
+        "Updated_Notes": {
+          "source": "Notes",
+          "display": {
+            "wait_for": [
+              "Num_Derived_Images"
+            ],
+            "template_engine": "handlebars",
+            "markdown_pattern": "{{{Notes}}} {{#with $fkey_Imaging_Image_Parent_Image_Image_RID_fkey}} {{#if Notes}}\n{{/if}} Extracted image {{{../Series}}} (from [{{{values.RID}}}]({{{uri.detailed}}})){{else if (gt _Num_Derived_Images 0) }} {{#if Notes}}\n{{/if}} Image set of {{{Num_Derived_Images}}} {{/with}}"
+          }
+        },
+        "Derived_Images": {
+          "source": derived_images_path,
+          "display": {
+            "template_engine": "handlebars",
+            "markdown_pattern": "The original file contains the following sequence of images. Click an individual image for visualization.\n\n {{#each $self}} [:span: Image {{{this.values.Series}}} :{{{this.values.RID}}} :/span:{.pseudo-column-rowname-thumbnail-title}![]({{#if this.values.Thumbnail_URL}}{{{this.values.Thumbnail_URL}}}{{else}}/facebase-images/click-for-image.png{{/if}}){height=150}]({{{this.uri.detailed}}}){.pseudo-column-rowname-thumbnail-link} {{/each}}"
+          },
+          "array_options": {
+            "order": [
+              {
+                "column": "Series",
+                "descending": False
               }
+            ]
+          },
+          "markdown_name": "Extracted Images"
+        },
+        "Generated_Tiff": {
+          "source": [
+            {
+              "inbound": [
+                "Imaging",
+                "Processed_Image_Reference_Image_fkey"
+              ]
             },
-            "Updated_Notes": {
-              "source": "Notes",
-              "display": {
-                "wait_for": [
-                  "Num_Derived_Images"
-                ],
-                "template_engine": "handlebars",
-                "markdown_pattern": "{{{Notes}}} {{#with $fkey_Imaging_Image_Parent_Image_Image_RID_fkey}} {{#if Notes}}\n{{/if}} Extracted image {{{../Series}}} (from [{{{values.RID}}}]({{{uri.detailed}}})){{else if (gt _Num_Derived_Images 0) }} {{#if Notes}}\n{{/if}} Image set of {{{Num_Derived_Images}}} {{/with}}"
+            "RID"
+          ],
+          "array_options": {
+            "order": [
+              {
+                "column": "Channel_Number",
+                "descending": False
               }
+            ]
+          },
+          "markdown_name": "Download TIFF"
+        },
+        "Parent_Image_Row": {
+          "source": [
+            {
+              "outbound": [
+                "Imaging",
+                "Image_Parent_Image_Image_RID_fkey"
+              ]
             },
-            "Derived_Images": {
-              "source": [
-                {
-                  "inbound": [
-                    "Imaging",
-                    "Image_Parent_Image_Image_RID_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "display": {
-                "template_engine": "handlebars",
-                "markdown_pattern": "The original file contains the following sequence of images. Click an individual image for visualization.\n\n {{#each $self}} [:span: Image {{{this.values.Series}}} :{{{this.values.RID}}} :/span:{.pseudo-column-rowname-thumbnail-title}![]({{#if this.values.Thumbnail_URL}}{{{this.values.Thumbnail_URL}}}{{else}}/facebase-images/click-for-image.png{{/if}}){height=150}]({{{this.uri.detailed}}}){.pseudo-column-rowname-thumbnail-link} {{/each}}"
-              },
-              "array_options": {
-                "order": [
-                  {
-                    "column": "Series",
-                    "descending": False
-                  }
-                ]
-              },
-              "markdown_name": "Extracted Images"
-            },
-            "Generated_Tiff": {
-              "source": [
-                {
-                  "inbound": [
-                    "Imaging",
-                    "Processed_Image_Reference_Image_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "array_options": {
-                "order": [
-                  {
-                    "column": "Channel_Number",
-                    "descending": False
-                  }
-                ]
-              },
-              "markdown_name": "Download TIFF"
-            },
-            "Parent_Image_Row": {
-              "source": [
-                {
-                  "outbound": [
-                    "Imaging",
-                    "Image_Parent_Image_Image_RID_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "display": {
-                "template_engine": "handlebars",
-                "markdown_pattern": "{{#if Parent_Image}}[{{{$self.values.RID}}}]({{{$self.uri.detailed}}}): {{{$self.values.Original_File_Name}}}{{/if}}"
-              },
-              "markdown_name": "Parent Image"
-            },
-            "Num_Derived_Images": {
-              "source": [
-                {
-                  "inbound": [
-                    "Imaging",
-                    "Image_Parent_Image_Image_RID_fkey"
-                  ]
-                },
-                "RID"
-              ],
-              "aggregate": "cnt",
-              "markdown_name": "Number of Derived Images"
-            }
-          }
+            "RID"
+          ],
+          "display": {
+            "template_engine": "handlebars",
+            "markdown_pattern": "{{#if Parent_Image}}[{{{$self.values.RID}}}]({{{$self.uri.detailed}}}): {{{$self.values.Original_File_Name}}}{{/if}}"
+          },
+          "markdown_name": "Parent Image"
         },
-        "tag:isrd.isi.edu,2016:visible-foreign-keys": {
-          "*": []
+        "Num_Derived_Images": {
+          "source": derived_images_path,
+          "aggregate": "cnt",
+          "markdown_name": "Number of Derived Images"
         }
       }
- 
+    },
+    "tag:isrd.isi.edu,2016:visible-foreign-keys": {
+      "*": []
+    }
+}
+
+"""
+Columns of the Image table: (name, type, comment, annotations).
+"""
+image_columns = [
+    ('Thumbnail_URL', builtin_types.text, None, image_thumbnail_annotations),
+    ('Notes', builtin_types.markdown, None, None),
+    ('Original_File_Name', builtin_types.text, None, None),
+    ('Pixels_Per_Meter', builtin_types.int4, 'Pixels per meter in image', None),
+    ('Parent_Image', builtin_types.text, None, None),
+    ('Primary_Table', builtin_types.text, None, None),
+    ('Default_Z', builtin_types.int4, 'The default z index (depth) used for visualization', None),
+    ('Series', builtin_types.int4, 'The series associated with this image in the original multi-image file. Null if the original file is a single image', None),
+    ('Total_Series', builtin_types.int4, 'The total number of series associated with this image', None),
+    ('Download_Tiff_URL', builtin_types.text, 'A tiff or ome-tiff image to be used for annotations using third party software such as QuPath. A tiff represents a single channel and single z image. A ome-tiff represents a multi-channels and single z image.', asset_annotations(browser_upload=False)),
+    ('Download_Tiff_Name', builtin_types.text, None, None),
+    ('Download_Tiff_Bytes', builtin_types.int8, None, None),
+    ('Download_Tiff_MD5', builtin_types.text, None, None),
+    ('Metadata_URL', builtin_types.text, 'A succinct OME metadata file (JSON format) derived from the original OME XML metadata', None),
+    ('Metadata_Name', builtin_types.text, None, None),
+    ('Metadata_Bytes', builtin_types.int8, None, None),
+    ('Metadata_MD5', builtin_types.text, None, None),
+    ('OME_XML_URL', builtin_types.text, 'OME XML metadata file', None),
+    ('OME_XML_Name', builtin_types.text, None, None),
+    ('OME_XML_Bytes', builtin_types.int8, None, None),
+    ('OME_XML_MD5', builtin_types.text, None, None),
+    ('Properties', builtin_types.jsonb, None, None),
+    ('Generated_Zs', builtin_types.int4, 'Number of z planes generated from this image.', None)
+]
+
+@lru_cache(maxsize=None)
+def image_table_def():
     table_name = 'Image'
     comment = None
-    model = catalog.getCatalogModel()
-    schema = model.schemas[schema_name]
-    if table_name not in schema.tables:
-        column_defs = [
-            Column.define(
-                'Thumbnail_URL',
-                builtin_types.text,
-                comment=None, 
-                annotations=thumbnail_annotations,                       
-                nullok=True
-                ),
-            Column.define(
-                'Notes',
-                builtin_types.markdown,
-                nullok=True
-                ),
-            Column.define(
-                'Original_File_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Pixels_Per_Meter',
-                builtin_types.int4,
-                comment='Pixels per meter in image',
-                nullok=True
-                ),
-            Column.define(
-                'Parent_Image',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Primary_Table',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Default_Z',
-                builtin_types.int4,
-                comment='The default z index (depth) used for visualization',
-                nullok=True
-                ),
-            Column.define(
-                'Series',
-                builtin_types.int4,
-                comment='The series associated with this image in the original multi-image file. Null if the original file is a single image',
-                nullok=True
-                ),
-            Column.define(
-                'Total_Series',
-                builtin_types.int4,
-                comment='The total number of series associated with this image',
-                nullok=True
-                ),
-            Column.define(
-                'Download_Tiff_URL',
-                builtin_types.text,
-                comment='A tiff or ome-tiff image to be used for annotations using third party software such as QuPath. A tiff represents a single channel and single z image. A ome-tiff represents a multi-channels and single z image.',
-                annotations = {
-                    "tag:isrd.isi.edu,2017:asset": {
-                      "browser_upload": False
-                    }
-                  },
-                nullok=True
-                ),
-            Column.define(
-                'Download_Tiff_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Download_Tiff_Bytes',
-                builtin_types.int8,
-                nullok=True
-                ),
-            Column.define(
-                'Download_Tiff_MD5',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Metadata_URL',
-                builtin_types.text,
-                comment='A succinct OME metadata file (JSON format) derived from the original OME XML metadata',
-                nullok=True
-                ),
-            Column.define(
-                'Metadata_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Metadata_Bytes',
-                builtin_types.int8,
-                nullok=True
-                ),
-            Column.define(
-                'Metadata_MD5',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'OME_XML_URL',
-                builtin_types.text,
-                comment='OME XML metadata file',
-                nullok=True
-                ),
-            Column.define(
-                'OME_XML_Name',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'OME_XML_Bytes',
-                builtin_types.int8,
-                nullok=True
-                ),
-            Column.define(
-                'OME_XML_MD5',
-                builtin_types.text,
-                nullok=True
-                ),
-            Column.define(
-                'Properties',
-                builtin_types.jsonb,
-                nullok=True
-                ),
-            Column.define(
-                'Generated_Zs',
-                builtin_types.int4,
-                comment='Number of z planes generated from this image.',
-                nullok=True
-                )
-            ]
+    column_defs = [
+        Column.define(column_name, column_type, comment=comment, annotations=annotations or {}, nullok=True)
+        for column_name, column_type, comment, annotations in image_columns
+    ]
 
-        key_defs = [
-            Key.define(['RID', 'Default_Z'],
-                       constraint_names=[['Imaging', 'Image_RID_Default_Z_key']]
-            )
-        ]
-        fkey_defs = [
-            ForeignKey.define(['Parent_Image'], 'Imaging', 'Image', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Parent_Image_Image_RID_fkey']],
-                              on_update='CASCADE',
-                              on_delete='CASCADE'   
-            ),
-            ForeignKey.define(['Primary_Table'], 'isa', 'imaging_data', ['RID'],
-                              constraint_names=[['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey']],
-                              on_update='CASCADE',
-                              on_delete='CASCADE'   
-            )
-        ]
-        table_def = Table.define(
-            table_name,
-            column_defs,
-            key_defs=key_defs,
-            fkey_defs=fkey_defs,
-            comment=comment,
-            annotations=table_annotations,
-            acls=table_acls,
-            acl_bindings=image_acl_bindings,
-            provide_system=True
+    key_defs = [
+        Key.define(['RID', 'Default_Z'],
+                   constraint_names=[['Imaging', 'Image_RID_Default_Z_key']]
         )
-        
-        schema.create_table(table_def)
-
-def create_Imaging_schema_if_not_exists(catalog):
-    annotations = {
-        "tag:misd.isi.edu,2015:display": {
-          "name_style": {
-            "title_case": True,
-            "underline_space": True
-          }
-        }
-    }
-    
-    schema_name = 'Imaging'
-    model = catalog.getCatalogModel()
-    if schema_name not in model.schemas:
-        schema_def = Schema.define(schema_name, acls=schema_acls, annotations=annotations)
-        model.create_schema(schema_def)
-
-parser = argparse.ArgumentParser()
-parser.add_argument('hostname')
-parser.add_argument('catalog_number')
-parser.add_argument('--credential_file')
-
-args = parser.parse_args()
-
-hostname = args.hostname
-catalog_number = args.catalog_number
-
-credentials = get_credential(args.hostname, args.credential_file) if 'credential_file' in args else get_credential(args.hostname)
-catalog_ermrest = ErmrestCatalog('https', hostname, catalog_number, credentials=credentials)
-catalog_ermrest.dcctx['cid'] = 'model'
+    ]
+    fkey_defs = [
+        ForeignKey.define(['Parent_Image'], 'Imaging', 'Image', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Parent_Image_Image_RID_fkey']],
+                          on_update='CASCADE',
+                          on_delete='CASCADE'   
+        ),
+        ForeignKey.define(['Primary_Table'], 'isa', 'imaging_data', ['RID'],
+                          constraint_names=[['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey']],
+                          on_update='CASCADE',
+                          on_delete='CASCADE'   
+        )
+    ]
+    return Table.define(
+        table_name,
+        column_defs,
+        key_defs=key_defs,
+        fkey_defs=fkey_defs,
+        comment=comment,
+        annotations=image_annotations,
+        acls=table_acls,
+        acl_bindings=image_acl_bindings,
+        provide_system=True
+    )
 
 """
-Restore the database to the previous status.
+Factories of the definitions of the Imaging tables, by table name.
+The factories are memoized: a definition is built once, on first use, and must not be modified.
 """
-print('Restoring ...')
-restore(catalog_ermrest)
+imaging_table_defs = {
+    'Image': image_table_def,
+    'Processed_Image': processed_image_table_def,
+    'Image_Channel': image_channel_table_def,
+    'Image_Z': image_z_table_def,
+    'Image_Annotation_File': image_annotation_file_table_def,
+    'Image_Annotation': image_annotation_table_def
+}
 
 """
-Create new vocabulary tables.
+Create a table of the Imaging schema if it does not exist.
+The definition of the table is only built when the table is missing.
 """
-print('Creating vocabulary tables ...')
-create_vocabulary_table_if_not_exist(catalog_ermrest, 'vocab', 'processing_status', 'A set of status for processing an image.')
-create_vocabulary_table_if_not_exist(catalog_ermrest, 'vocab', 'display_method', 'Table containing controlled names for image display methods.')
-create_vocabulary_table_if_not_exist(catalog_ermrest, 'vocab', 'color', 'Colors and other terms used to describe slide channel appearance.')
+def create_table_if_not_exists(catalog, schema_name, table_name, model=None):
+    if model == None:
+        model = catalog.getCatalogModel()
+    schema = model.schemas[schema_name]
+    if table_name in schema.tables:
+        return
+    schema.create_table(imaging_table_defs[table_name]())
 
-"""
-Load data into the new vocabulary tables.
-"""
-print('Loading the vocabulary tables ...')
-add_rows_to_vocab_processing_status(catalog_ermrest)
-add_rows_to_vocab_display_method(catalog_ermrest)
-add_rows_to_vocab_color(catalog_ermrest)
+imaging_schema_annotations = {
+    "tag:misd.isi.edu,2015:display": {
+      "name_style": {
+        "title_case": True,
+        "underline_space": True
+      }
+    }
+}
 
 """
-Create the Imaging schema.
+Create the Imaging schema if it does not exist.
+The tables of the schema are embedded in the schema definition,
+so the schema and all its tables are created with a single request.
 """
-print('Creating the Imaging schema ...')
-create_Imaging_schema_if_not_exists(catalog_ermrest)
+def create_Imaging_schema_if_not_exists(catalog, model=None):
+    schema_name = 'Imaging'
+    if model == None:
+        model = catalog.getCatalogModel()
+    if schema_name not in model.schemas:
+        schema_def = Schema.define(schema_name, acls=schema_acls, annotations=imaging_schema_annotations)
+        schema_def['tables'] = {table_name: table_def() for table_name, table_def in imaging_table_defs.items()}
+        model.create_schema(schema_def)
 
 """
-Create the Image table.
+Create the Imaging model and update the imaging_data table.
+All the changes are made against the cached model;
+the annotation changes to imaging_data are staged locally and applied with a single request.
 """
-print('Creating the Image table ...')
-create_image_table_if_not_exists(catalog_ermrest, 'Imaging')
+def update_model(catalog, model):
+    logger.info('Creating the Imaging schema ...')
+    create_Imaging_schema_if_not_exists(catalog, model=model)
 
-"""
-Create new tables required for the image processing.
-"""
-print('Creating the image tables ...')
-create_image_z_table_if_not_exists(catalog_ermrest, 'Imaging')
-create_image_channel_table_if_not_exists(catalog_ermrest, 'Imaging')
-create_processed_image_table_if_not_exists(catalog_ermrest, 'Imaging')
+    # Tables missing from an existing Imaging schema, created one at a time,
+    # each after the tables it references.
+    logger.info('Creating the image and annotation tables ...')
+    for table_name in ['Image', 'Image_Z', 'Image_Channel', 'Image_Annotation_File', 'Processed_Image', 'Image_Annotation']:
+        create_table_if_not_exists(catalog, 'Imaging', table_name, model=model)
 
-"""
-Create the image annotation tables.
-"""
-print('Creating the annotation tables ...')
-create_image_annotation_file_table_if_not_exists(catalog_ermrest, 'Imaging')
-create_image_annotation_table_if_not_exists(catalog_ermrest, 'Imaging')
+    logger.info('Adding columns to the imaging_data table ...')
+    add_columns_if_not_exist(catalog, 'isa', 'imaging_data', imaging_data_columns, model=model)
 
-"""
-Add columns to the imaging_data table.
-"""
-print('Adding columns to the imaging_data table ...')
-add_column_if_not_exist(catalog_ermrest, 'isa', 'imaging_data', 'processing_status', 'text', 'new', True)
+    logger.info('Adding FK to the imaging_data table ...')
+    create_foreign_keys_if_not_exist(catalog, 'isa', 'imaging_data', imaging_data_foreign_keys, model=model)
 
-"""
-Create Foreign Keys.
-"""
-print('Adding FK to the imaging_data table ...')
-create_foreign_key_if_not_exist(catalog_ermrest, 'isa', 'imaging_data', ['processing_status'], 'vocab', 'processing_status', ['Name'])
+    changed = False
+    logger.info('Adding the source definition annotations ...')
+    changed |= add_annotation_source_definitions(catalog, 'isa', 'imaging_data', source_definitions, model=model, apply=False)
+
+    logger.info('Adding the visible foreign keys annotations ...')
+    changed |= add_annotation_visible_foreign_keys(catalog, 'isa', 'imaging_data', ['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey'], model=model, apply=False)
+
+    logger.info('Adding the visible columns annotations ...')
+    changed |= add_annotation_visible_columns(catalog, 'isa', 'imaging_data', ['isa', 'imaging_data_processing_status_fkey'], model=model, apply=False)
+    changed |= add_annotation_visible_columns(catalog, 'isa', 'imaging_data', virtual_column, model=model, apply=False)
+
+    if changed == True:
+        logger.info('Applying the annotations ...')
+        model.schemas['isa'].tables['imaging_data'].apply()
 
 """
-Create visible annotations.
+Describe the changes made to the catalog by main(), without making them.
+restore() drops the existing objects; all the objects are then created again.
 """
-print('Adding the source definition annotations ...')
-add_annotation_source_definitions(catalog_ermrest, 'isa', 'imaging_data', source_definitions)
+def plan_schema_updates(model):
+    steps = []
+    imaging_data = model.schemas['isa'].tables.get('imaging_data')
+    if imaging_data != None:
+        for foreign_key_columns, reference_schema, reference_table, referenced_columns in imaging_data_foreign_keys:
+            constraint_name = fkey_name('imaging_data', foreign_key_columns)
+            if (model.schemas['isa'], constraint_name) in imaging_data.foreign_keys.elements:
+                steps.append('Dropping Foreign Key: {} of table isa:imaging_data'.format(constraint_name))
+        for column_name, column_type, default_value, nullok in imaging_data_columns:
+            if column_name in imaging_data.columns.elements:
+                steps.append('Dropping column: {} of table isa:imaging_data'.format(column_name))
+    for schema_name, table_name in restore_drop_tables:
+        if schema_name in model.schemas and table_name in model.schemas[schema_name].tables:
+            steps.append('Dropping table {}:{}'.format(schema_name, table_name))
+    if 'Imaging' in model.schemas:
+        steps.append('Dropping schema Imaging')
+    for table_name, comment in vocabulary_tables:
+        steps.append('Creating table vocab:{}'.format(table_name))
+        steps.append('Loading the rows of vocab:{}'.format(table_name))
+    steps.append('Creating schema Imaging with tables {}'.format(', '.join(imaging_table_defs)))
+    for column_name, column_type, default_value, nullok in imaging_data_columns:
+        steps.append('Adding column: {} to table isa:imaging_data'.format(column_name))
+    for foreign_key_columns, reference_schema, reference_table, referenced_columns in imaging_data_foreign_keys:
+        steps.append('Adding Foreign Key: {} to table isa:imaging_data'.format(fkey_name('imaging_data', foreign_key_columns)))
+    steps.append('Applying the annotations of table isa:imaging_data')
+    return steps
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('hostname')
+    parser.add_argument('catalog_number')
+    parser.add_argument('--credential_file')
+    parser.add_argument('--dry-run', action='store_true')
+
+    args = parser.parse_args()
+
+    # deriva's own loggers stay at the default warning level
+    logging.basicConfig(format='%(asctime)s: %(levelname)s: %(message)s')
+    logger.setLevel(logging.INFO)
+
+    hostname = args.hostname
+    catalog_number = args.catalog_number
+
+    credentials = get_credential(args.hostname, args.credential_file) if 'credential_file' in args else get_credential(args.hostname)
+    if credentials == None:
+        sys.stderr.write('error: no credential found for {}\n'.format(hostname))
+        return 1
+    catalog_ermrest = ErmrestCatalog('https', hostname, catalog_number, credentials=credentials)
+    catalog_ermrest.dcctx['cid'] = 'model'
+    tune_session(catalog_ermrest._session, 4)
+
+    # Check the credential before reading the model, so an expired login fails before any change.
+    try:
+        catalog_ermrest.get_authn_session()
+    except HTTPError as e:
+        sys.stderr.write('error: the credential for {} is not valid: {}\n'.format(hostname, e))
+        return 1
+
+    model = catalog_ermrest.getCatalogModel()
+
+    if args.dry_run:
+        for step in plan_schema_updates(model):
+            print(step)
+        return 0
+
+    # Restore the database to the previous status.
+    logger.info('Restoring ...')
+    restore(catalog_ermrest, model=model)
+
+    # Create new vocabulary tables.
+    logger.info('Creating vocabulary tables ...')
+    for table_name, comment in vocabulary_tables:
+        create_vocabulary_table_if_not_exist(catalog_ermrest, 'vocab', table_name, comment, model=model)
+
+    # Load data into the new vocabulary tables.
+    logger.info('Loading the vocabulary tables ...')
+    add_rows_to_vocab_tables(catalog_ermrest)
 
-print('Adding the visible foreign keys annotations ...')
-add_annotation_visible_foreign_keys(catalog_ermrest, 'isa', 'imaging_data', ['Imaging', 'Image_Primary_Table_imaging_data_RID_fkey'])
+    # Create the Imaging schema and tables, and update the imaging_data table.
+    logger.info('Updating the model ...')
+    update_model(catalog_ermrest, model)
 
-print('Adding the visible columns annotations ...')
-add_annotation_visible_columns(catalog_ermrest, 'isa', 'imaging_data', ['isa', 'imaging_data_processing_status_fkey'])
-add_annotation_visible_columns(catalog_ermrest, 'isa', 'imaging_data', virtual_column)
+    logger.info('End of schema updates')
+    return 0
 
-print('End of schema updates')
 
+if __name__ == '__main__':
+    sys.exit(main())